@@ -17,6 +17,7 @@ Storages SGPhasing regions and linked regions.
 Classes:
   - Region
   - Linked_Region
+  - RegionIndex
 
 Manipulates SGPhasing regions and linked regions.
 -------------------------------------------------
@@ -25,12 +26,17 @@ Functions:
   - merge_two_linked_regions
   - check_two_linked_regions
   - coverage_two_regions
+  - cached_coverage_two_regions
   - update_info_str_id
+  - get_info_dict
+  - get_info_value
 """
 
+from bisect import bisect_left
 from io import TextIOWrapper
+from sys import intern
 
-from SGPhasing.sys_output import Output
+from SGPhasing.sys_output import output
 
 
 class Region(object):
@@ -45,6 +51,8 @@ class Region(object):
         child_list (list): child regions in list, which are within this region.
     """
 
+    __slots__ = ('chrom', 'start', 'end', 'strand', 'info', 'child_list')
+
     def __init__(self,
                  chrom: str,
                  start: int,
@@ -60,23 +68,25 @@ class Region(object):
             strand (str): '+' or '-'.
             info (str): gff3 9th column string, default ''.
         """
-        self.chrom = chrom
+        self.chrom = intern(chrom)
         self.start = start
         self.end = end
-        self.strand = strand
+        self.strand = intern(strand)
         self.info = info
         self.child_list = []
-        super().__init__()
 
     def copy(self):
         """Copy this region.
 
+        The child list is copied but child regions are shared, and are
+        not checked again since this region has been checked already.
+
         Returns:
             new_region (Region): copied region.
         """
         new_region = Region(self.chrom, self.start, self.end,
                             self.strand, self.info)
-        new_region.update_child_list(self.child_list)
+        new_region.child_list = self.child_list[::]
         return new_region
 
     def update_child_list(self, child_list: list) -> None:
@@ -88,7 +98,6 @@ class Region(object):
         self.child_list = child_list
         if not self.check_child():
             self.child_list = []
-            output = Output()
             output.warning('Region.child_list does not updated. '
                            'Please check your child_list input.')
 
@@ -98,10 +107,12 @@ class Region(object):
         Returns:
             (bool): whether all child regions are within this region.
         """
-        return all([each_child.chrom == self.chrom and
-                    each_child.strand == self.strand and
-                    self.start <= each_child.start < each_child.end <= self.end
-                    for each_child in self.child_list])
+        chrom, strand, start, end = (
+            self.chrom, self.strand, self.start, self.end)
+        return all(each_child.chrom == chrom and
+                   each_child.strand == strand and
+                   start <= each_child.start < each_child.end <= end
+                   for each_child in self.child_list)
 
     def update_info_id(self, new_id: str) -> None:
         """Update information id for this region.
@@ -120,7 +131,7 @@ class Region(object):
         Returns:
             (str): region id string.
         """
-        return get_info_dict(self.info).get('Parent', '')
+        return get_info_value(self.info, 'Parent')
 
     def get_main_dict(self) -> dict:
         """Get main information dict from Region.
@@ -136,9 +147,19 @@ class Region(object):
         Returns:
             (str): gff3 line string.
         """
-        return '\t'.join([
-            self.chrom, 'sgphasing_tmp', 'mRNA' if self.child_list else 'exon',
-            str(self.start), str(self.end), '.', self.strand, '.', self.info])
+        region_type = 'mRNA' if self.child_list else 'exon'
+        return (f'{self.chrom}\tsgphasing_tmp\t{region_type}\t'
+                f'{self.start}\t{self.end}\t.\t{self.strand}\t.\t{self.info}')
+
+    def gff_lines(self) -> list:
+        """Convert this region and all child regions to gff3 lines.
+
+        Returns:
+            (list): gff3 line strings ending with newline.
+        """
+        return [self.to_gff_string() + '\n'] + [
+            each_child.to_gff_string() + '\n'
+            for each_child in self.child_list]
 
     def write_gff(self, opened_gff: TextIOWrapper) -> None:
         """Write this region and all child regions to gff3 file.
@@ -146,9 +167,7 @@ class Region(object):
         Args:
             opened_gff (TextIOWrapper): opened gff3 file handle.
         """
-        opened_gff.write(self.to_gff_string() + '\n')
-        for each_child in self.child_list:
-            opened_gff.write(each_child.to_gff_string() + '\n')
+        opened_gff.writelines(self.gff_lines())
 
 
 class Linked_Region(object):
@@ -159,6 +178,8 @@ class Linked_Region(object):
         Secondary_Regions_list (list): secondary regions in list.
     """
 
+    __slots__ = ('Primary_Region', 'Secondary_Regions_list')
+
     def __init__(self, Primary_Region: Region) -> None:
         """Initialize Linked_Region.
 
@@ -167,7 +188,6 @@ class Linked_Region(object):
         """
         self.Primary_Region = Primary_Region
         self.Secondary_Regions_list = []
-        super().__init__()
 
     def update_secondary(self, Secondary_Regions_list: list) -> None:
         """Update secondary regions list.
@@ -200,22 +220,24 @@ class Linked_Region(object):
         """Flatten Linked_Region to a list.
 
         Returns:
-            new_region_list (list): a list contain all regions
-                                    in Linked_Region.
+            (list): a list contain all regions in Linked_Region.
         """
-        new_region_list = self.Secondary_Regions_list[::]
-        new_region_list.insert(0, self.Primary_Region)
-        return new_region_list
+        return [self.Primary_Region, *self.Secondary_Regions_list]
 
     def extend_primary(self, length: int = 1000) -> Region:
         """Extend primary region by the length.
 
+        Every child is copied, so updating the info id of the extended
+        region leaves the primary region untouched.
+
         Args:
             length (int): primary region extended length, default 1000.
         """
         new_region = self.Primary_Region.copy()
         new_region.start -= length
         new_region.end += length
+        new_region.child_list = [
+            each_child.copy() for each_child in new_region.child_list]
         if new_region.child_list:
             new_region.child_list[0].start -= length
             new_region.child_list[-1].end += length
@@ -227,15 +249,100 @@ class Linked_Region(object):
         Args:
             output_gff (str): output gff3 file path string.
         """
+        gff_lines = self.Primary_Region.gff_lines()
+        for region in self.Secondary_Regions_list:
+            gff_lines.extend(region.gff_lines())
+        with open(output_gff, 'w') as opened_gff:
+            opened_gff.writelines(gff_lines)
+
+    def write_combined_gff(self,
+                           output_gff: str,
+                           new_id: str,
+                           length: int = 1000) -> None:
+        """Write this linked region and its extended primary to gff3 file.
+
+        Linked regions are turned into lines before the extended primary
+        region is renamed, so its exons keep their own parents.
+
+        Args:
+            output_gff (str): output gff3 file path string.
+            new_id (str): new id string for the extended primary region.
+            length (int): primary region extended length, default 1000.
+        """
+        gff_lines = [gff_line for region in self.flatten()
+                     for gff_line in region.gff_lines()]
+        expanded_primary_region = self.extend_primary(length)
+        expanded_primary_region.update_info_id(new_id)
+        gff_lines.extend(expanded_primary_region.gff_lines())
         with open(output_gff, 'w') as opened_gff:
-            self.Primary_Region.write_gff(opened_gff)
-            for region in self.Secondary_Regions_list:
-                region.write_gff(opened_gff)
+            opened_gff.writelines(gff_lines)
+
+
+class RegionIndex(object):
+    """The sorted region index class for overlap querying.
+
+    Regions are grouped by (chrom, strand) and sorted by start position,
+    so that candidates overlapping a query can be found by binary search.
+
+    Attributes:
+        starts_dict (dict): (chrom, strand) as key and sorted starts list
+                            as value.
+        regions_dict (dict): (chrom, strand) as key and (region_id, Region)
+                             list sorted by start as value.
+        maxlen_dict (dict): (chrom, strand) as key and max region length
+                            as value.
+    """
+
+    def __init__(self, region_list: list) -> None:
+        """Initialize RegionIndex.
+
+        Args:
+            region_list (list): regions in list.
+        """
+        self.starts_dict, self.regions_dict, self.maxlen_dict = {}, {}, {}
+        for region_id, region in enumerate(region_list):
+            self.regions_dict.setdefault(
+                (region.chrom, region.strand), []).append((region_id, region))
+        for key, id_region_list in self.regions_dict.items():
+            id_region_list.sort(key=lambda id_region: id_region[1].start)
+            self.starts_dict[key] = [
+                region.start for _, region in id_region_list]
+            self.maxlen_dict[key] = max(
+                region.end - region.start for _, region in id_region_list)
+        super().__init__()
+
+    def query(self, chrom: str, strand: str, start: int, end: int) -> list:
+        """Find indexed regions which overlap the query interval.
+
+        Args:
+            chrom (str): query chromosome id.
+            strand (str): query strand, '+' or '-'.
+            start (int): query start position.
+            end (int): query end position.
+
+        Returns:
+            overlap_list (list): overlapped regions in index order.
+        """
+        key = (chrom, strand)
+        if key not in self.starts_dict:
+            return []
+        starts = self.starts_dict[key]
+        id_region_list = self.regions_dict[key]
+        lower_start = start - self.maxlen_dict[key]
+        overlap_list = []
+        index = bisect_left(starts, end) - 1
+        while index >= 0 and starts[index] >= lower_start:
+            region_id, region = id_region_list[index]
+            if region.end > start:
+                overlap_list.append((region_id, region))
+            index -= 1
+        return [region for _, region in sorted(overlap_list)]
 
 
 def merge_two_linked_regions(Linked_Region1: Linked_Region,
                              Linked_Region2: Linked_Region,
-                             threshold_coverage: float = 0.5) -> Linked_Region:
+                             threshold_coverage: float = 0.5,
+                             coverage_cache: dict = None) -> Linked_Region:
     """Merge two linked regions.
 
     Args:
@@ -243,16 +350,24 @@ def merge_two_linked_regions(Linked_Region1: Linked_Region,
         Linked_Region2 (Linked_Region): second Linked_Region for merging.
         threshold_coverage (float): threshold coverage for merging,
                                     default 0.5.
+        coverage_cache (dict): coverage cache shared by a batch of
+                               merges and checks, default None.
 
     Returns:
         Linked_Region (Linked_Region): merged linked region.
     """
+    if coverage_cache is None:
+        coverage_cache = {}
+    region1_index = RegionIndex(Linked_Region1.flatten())
     region2_list = Linked_Region2.flatten()
     region2_id_list = []
     for region2_id, region2 in enumerate(region2_list):
-        for region1 in Linked_Region1.flatten():
-            if coverage_two_regions(region1, region2) > threshold_coverage:
+        for region1 in region1_index.query(
+                region2.chrom, region2.strand, region2.start, region2.end):
+            if cached_coverage_two_regions(
+                    region1, region2, coverage_cache) > threshold_coverage:
                 region2_id_list.append(region2_id)
+                break
     for region2_id in region2_id_list:
         Linked_Region1.append_secondary(region2_list[region2_id])
     return Linked_Region1
@@ -260,7 +375,8 @@ def merge_two_linked_regions(Linked_Region1: Linked_Region,
 
 def check_two_linked_regions(Linked_Region1: Linked_Region,
                              Linked_Region2: Linked_Region,
-                             threshold_coverage: float = 0.5) -> bool:
+                             threshold_coverage: float = 0.5,
+                             coverage_cache: dict = None) -> bool:
     """Check whether two linked regions have overlap.
 
     Args:
@@ -268,36 +384,67 @@ def check_two_linked_regions(Linked_Region1: Linked_Region,
         Linked_Region2 (Linked_Region): second Linked_Region for checking.
         threshold_coverage (float): threshold coverage for checking,
                                     default 0.5.
+        coverage_cache (dict): coverage cache shared by a batch of
+                               merges and checks, default None.
 
     Returns:
         (bool): whether two linked regions have overlap.
     """
-    return any(
-        coverage > threshold_coverage for coverage in
-        [coverage_two_regions(Linked_Region1.Primary_Region, secondary_region)
-         for secondary_region in Linked_Region2.Secondary_Regions_list] +
-        [coverage_two_regions(Linked_Region2.Primary_Region, secondary_region)
-         for secondary_region in Linked_Region1.Secondary_Regions_list])
+    if coverage_cache is None:
+        coverage_cache = {}
+    primary_region1 = Linked_Region1.Primary_Region
+    primary_region2 = Linked_Region2.Primary_Region
+    return (
+        any(cached_coverage_two_regions(
+                primary_region1, secondary_region, coverage_cache) >
+            threshold_coverage
+            for secondary_region in Linked_Region2.Secondary_Regions_list) or
+        any(cached_coverage_two_regions(
+                primary_region2, secondary_region, coverage_cache) >
+            threshold_coverage
+            for secondary_region in Linked_Region1.Secondary_Regions_list))
 
 
 def coverage_two_regions(Region1: Region, Region2: Region) -> float:
     """Calculate two regions overlap coverage.
 
     Args:
-        Region1 (Linked_Region): first Region for calculating.
-        Region2 (Linked_Region): second Region for calculating.
+        Region1 (Region): first Region for calculating.
+        Region2 (Region): second Region for calculating.
 
     Returns:
         (float): coverage of two regions.
     """
-    if Region1.chrom == Region2.chrom and Region1.strand == Region2.strand:
-        gap_list = [Region1.end - Region2.start, Region2.end - Region1.start]
-        if all([gap > 0 for gap in gap_list]):
-            return min(gap_list)/max(gap_list)
-        else:
-            return 0
-    else:
+    if Region1.chrom != Region2.chrom or Region1.strand != Region2.strand:
+        return 0
+    gap1 = Region1.end - Region2.start
+    gap2 = Region2.end - Region1.start
+    if gap1 <= 0 or gap2 <= 0:
         return 0
+    return gap1/gap2 if gap1 < gap2 else gap2/gap1
+
+
+def cached_coverage_two_regions(Region1: Region,
+                                Region2: Region,
+                                coverage_cache: dict) -> float:
+    """Calculate two regions overlap coverage with a cache.
+
+    The cache is keyed by region object ids, so it must only be shared
+    while the regions are alive and their positions are unchanged.
+
+    Args:
+        Region1 (Region): first Region for calculating.
+        Region2 (Region): second Region for calculating.
+        coverage_cache (dict): (id, id) tuple as key and coverage as value.
+
+    Returns:
+        (float): coverage of two regions.
+    """
+    id1, id2 = id(Region1), id(Region2)
+    key = (id1, id2) if id1 < id2 else (id2, id1)
+    if key not in coverage_cache:
+        coverage_cache[key] = coverage_two_regions(Region1, Region2)
+    return coverage_cache[key]
 
 
 def get_info_dict(anno_info: str) -> dict:
@@ -309,12 +456,21 @@ def get_info_dict(anno_info: str) -> dict:
     Returns:
         info_dict (dict): gff3 9th column information dictionary.
     """
-    info_dict = {}
-    info_sp = anno_info.split(';')
-    for each_info in info_sp:
-        each_info_sp = each_info.split('=')
-        info_dict.update({each_info_sp[0]: each_info_sp[1]})
-    return info_dict
+    return {key: value for key, value in (
+        each_info.split('=', 1) for each_info in anno_info.split(';'))}
+
+
+def get_info_value(anno_info: str, key: str) -> str:
+    """Get one value from gff3 9th column without parsing all of it.
+
+    Args:
+        anno_info (str): gff3 9th column string.
+        key (str): information key string.
+
+    Returns:
+        (str): information value, '' if key not exists.
+    """
+    return (';' + anno_info).partition(f';{key}=')[2].partition(';')[0]
 
 
 def update_info_str_id(info_str: str, new_id: str) -> str:
@@ -327,8 +483,24 @@ def update_info_str_id(info_str: str, new_id: str) -> str:
     Returns:
         (str): updated information string.
     """
-    info_dict = get_info_dict(info_str)
-    new_name = new_id + '.' + info_dict.get('Name', '').split('.')[-1]
-    info_dict.update({'ID': new_name, 'Name': new_name, 'Parent': new_id})
-    return ';'.join(
-        [info_k+'='+info_v for info_k, info_v in info_dict.items()])
+    info_list, id_key_index, name = [], {}, ''
+    for each_info in info_str.split(';'):
+        if not each_info:
+            continue
+        info_k, _, info_v = each_info.partition('=')
+        if info_k in ('ID', 'Name', 'Parent'):
+            if info_k == 'Name':
+                name = info_v
+            if info_k in id_key_index:
+                continue
+            id_key_index[info_k] = len(info_list)
+        info_list.append(each_info)
+    new_name = new_id + '.' + name.rpartition('.')[2]
+    for info_k, info_v in (('ID', new_name),
+                           ('Name', new_name),
+                           ('Parent', new_id)):
+        if info_k in id_key_index:
+            info_list[id_key_index[info_k]] = info_k + '=' + info_v
+        else:
+            info_list.append(info_k + '=' + info_v)
+    return ';'.join(info_list)
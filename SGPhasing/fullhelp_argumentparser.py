@@ -45,12 +45,10 @@ Classes:
 """
 
 from argparse import ArgumentParser, HelpFormatter
-from importlib import import_module
 from logging import getLogger
 from os import getpid
 from re import ASCII, compile
 from sys import exit, stderr
-from textwrap import wrap
 
 from SGPhasing.sys_output import Output
 
@@ -83,6 +81,7 @@ class ScriptExecutor(object):
 
     def import_script(self):
         """Only import a script's modules when running that script."""
+        from importlib import import_module
         src = 'SGPhasing'
         mod = '.'.join((src, self.command.lower()))
         module = import_module(mod)
@@ -141,6 +140,8 @@ class SmartFormatter(HelpFormatter):
     Adapted from: https://stackoverflow.com/questions/3853722
     """
 
+    _whitespace_matcher_limited = compile(r'[ \r\f\v]+', ASCII)
+
     def __init__(self,
                  prog: str,
                  indent_increment: int = 2,
@@ -155,10 +156,10 @@ class SmartFormatter(HelpFormatter):
             width: width, default None.
         """
         super().__init__(prog, indent_increment, max_help_position, width)
-        self._whitespace_matcher_limited = compile(r'[ \r\f\v]+', ASCII)
 
     def _split_lines(self, text: str, width) -> list:
         if text.startswith('R|'):
+            from textwrap import wrap
             text = self._whitespace_matcher_limited.sub(' ', text).strip()[2:]
             output = []
             for txt in text.splitlines():
@@ -249,7 +250,9 @@ class SGPhasingArgs(object):
             command,
             help=description,
             description=description,
-            epilog='Questions and feedback: '
+            epilog='Up to date intermediate files are reused, set '
+                   'SGPHASING_FORCE=1 in the environment to rebuild them. '
+                   'Questions and feedback: '
                    'https://github.com/SGPhasing/SGPhasing',
             formatter_class=SmartFormatter)
         return parser
@@ -258,11 +261,11 @@ class SGPhasingArgs(object):
         """Parse the arguments passed in from argparse."""
         options = (self.global_arguments + self.argument_list +
                    self.optional_arguments)
+        add_argument = self.parser.add_argument
         for option in options:
-            args = option['opts']
-            kwargs = {key: option[key]
-                      for key in option.keys() if key != 'opts'}
-            self.parser.add_argument(*args, **kwargs)
+            kwargs = option.copy()
+            args = kwargs.pop('opts')
+            add_argument(*args, **kwargs)
 
 
 class IndexArgs(SGPhasingArgs):
@@ -18,15 +18,15 @@ Classes:
   - Index
 """
 
-from gc import collect
+from contextlib import nullcontext
 from logging import getLogger
 from multiprocessing import Pool
 from pathlib import Path
-import sys
 
 from SGPhasing.processor.collapse import collapse_isoforms_by_sam
 from SGPhasing.processor.gff_to_fasta import gff_to_fasta
 from SGPhasing.processor.index_each_link import index_each_link
+from SGPhasing.processor.index_each_link import init_worker
 from SGPhasing.processor.minimap2 import splice_mapper
 from SGPhasing.processor.sam_to_gff import sam_to_gff
 from SGPhasing.reader import read_fastx, read_xam
@@ -36,7 +36,7 @@ from SGPhasing.writer.write_fastx import write_partial_fastx
 from SGPhasing.writer.write_gff import write_partial_gff
 from SGPhasing.writer.write_index import write_index
 from SGPhasing.writer.write_xam import write_partial_sam
-from SGPhasing.sys_output import Output
+from SGPhasing.sys_output import Output, redirect_output
 
 logger = getLogger(__name__)  # pylint: disable=invalid-name
 
@@ -74,7 +74,15 @@ class Index(object):
         self.opened_log_file = (
             self.tmp_floder_path / 'sgphasing.log').open('w')
         read_fastx.check_index(self.args.reference, self.args.threads)
-        self.args.input = read_xam.check_index(self.args.input)
+        read_fastx.check_fastx_index(self.args.fastx)
+        self.args.input = read_xam.check_index(
+            self.args.input, self.args.threads)
+
+    def log_redirect(self):
+        """Redirect output into log file unless in verbose mode."""
+        if self.args.verbose:
+            return nullcontext()
+        return redirect_output(self.opened_log_file)
 
     def check_bed(self) -> None:
         """Check input limitation bed file."""
@@ -85,57 +93,54 @@ class Index(object):
 
     def get_multimapped_reads(self) -> None:
         """Get multiply mapped reads from input bam."""
-        self.multimapped_reads_set = set()
-        self.opened_xam, input_format = read_xam.open_xam(self.args.input)
-        for read in self.opened_xam.fetch():
-            if read.is_secondary:
-                self.multimapped_reads_set.add(read.query_name)
-        if self.limit_region_dict:
-            region_reads_set = set()
-            for chrom, region_list in self.limit_region_dict.items():
-                for start, end in region_list:
-                    for read in self.opened_xam.fetch(chrom, start, end):
-                        region_reads_set.add(read.query_name)
-            self.multimapped_reads_set &= region_reads_set
-            del region_reads_set
-            collect()
+        # only names and flags are needed, cram skips decoding the rest
+        with read_xam.open_xam(self.args.input, self.args.threads,
+                               read_xam.NAME_FLAG_FIELDS) as opened_xam:
+            self.multimapped_reads_set = {
+                read.query_name
+                for read in opened_xam.fetch(until_eof=True)
+                if read.flag & 0x100}
+            if self.limit_region_dict:
+                self.multimapped_reads_set = {
+                    read.query_name
+                    for read in read_xam.fetch_regions(
+                        opened_xam, self.limit_region_dict)
+                    if read.query_name in self.multimapped_reads_set}
 
     def get_primary_region(self) -> None:
         """Get primary region from multiply mapped reads."""
         self.primary_sam_path = self.tmp_floder_path / 'primary_reference.sam'
+        self.opened_xam = read_xam.open_xam(
+            self.args.input, self.args.threads)
         self.primary_region, self.primary_reads_set = (
             write_partial_sam(
                 self.opened_xam, str(self.primary_sam_path),
-                self.limit_region_dict, self.multimapped_reads_set))
+                self.limit_region_dict, self.multimapped_reads_set,
+                self.args.threads))
         del self.limit_region_dict, self.multimapped_reads_set
-        collect()
         self.opened_xam.close()
 
         self.opened_fastx, self.fastx_format = read_fastx.open_fastx(
             self.args.fastx)
         self.primary_fastx_path = (self.tmp_floder_path /
-                                   ('primary.' + self.fastx_format))
+                                   f'primary.{self.fastx_format}')
         write_partial_fastx(
-            self.opened_fastx, self.primary_fastx_path.open('w'),
+            self.opened_fastx, self.primary_fastx_path.open('wb'),
             self.fastx_format, self.primary_reads_set)
         del self.primary_reads_set
-        collect()
         self.opened_fastx.close()
 
     def collapse_primary_sam(self) -> None:
         """Collapse primary isoforms by sam."""
         self.output.info('Running cDNA_cupcake collapse_isoforms_by_sam')
         if not self.args.verbose:
-            sys.stdout = self.opened_log_file
-            sys.stderr = self.opened_log_file
             self.opened_log_file.write(
                 'cDNA_cupcake collapse_isoforms_by_sam info:\n')
-        self.primary_gff, self.most_iso_id_list = collapse_isoforms_by_sam(
-            str(self.primary_sam_path), str(self.primary_fastx_path),
-            self.fastx_format == 'fastq', self.tmp_floder_path)
-        if not self.args.verbose:
-            sys.stdout = sys.__stdout__
-            sys.stderr = sys.__stderr__
+        with self.log_redirect():
+            self.primary_gff, self.most_iso_id_list = (
+                collapse_isoforms_by_sam(
+                    str(self.primary_sam_path), str(self.primary_fastx_path),
+                    self.fastx_format == 'fastq', self.tmp_floder_path))
 
     def get_most_supported_fasta(self) -> None:
         """Get most supported isoforms gff."""
@@ -144,46 +149,35 @@ class Index(object):
         write_partial_gff(
             self.primary_gff, self.opened_most_gff, self.most_iso_id_list)
         del self.most_iso_id_list
-        collect()
         self.opened_most_gff.close()
         self.primary_fasta_path = (self.tmp_floder_path /
                                    'primary_reference.most.fasta')
         self.output.info('Running cufflinks gffread')
-        if self.args.verbose:
-            self.output.info(gff_to_fasta(
-                self.opened_most_gff.name, self.args.reference,
-                str(self.primary_fasta_path)))
-        else:
+        if not self.args.verbose:
             self.opened_log_file.write('cufflinks gffread info:\n')
-            self.opened_log_file.write(gff_to_fasta(
-                self.opened_most_gff.name, self.args.reference,
-                str(self.primary_fasta_path)))
+        with self.log_redirect():
+            gff_to_fasta(self.opened_most_gff.name, self.args.reference,
+                         str(self.primary_fasta_path))
 
     def get_link_region(self) -> None:
         """Get linked region for each primary region."""
         self.primary_sam_path = (self.tmp_floder_path /
                                  'primary.minimap2_reference.sam')
         self.output.info(f'Running minimap2 with {self.args.threads} threads')
-        if self.args.verbose:
-            self.output.info(splice_mapper(
-                self.args.reference, str(self.primary_fasta_path),
-                str(self.primary_sam_path), self.args.threads))
-        else:
+        if not self.args.verbose:
             self.opened_log_file.write('minimap2 info:\n')
-            self.opened_log_file.write(splice_mapper(
-                self.args.reference, str(self.primary_fasta_path),
-                str(self.primary_sam_path), self.args.threads))
+        with self.log_redirect():
+            splice_mapper(self.args.reference, str(self.primary_fasta_path),
+                          str(self.primary_sam_path), self.args.threads)
         self.primary_gff_path = (
             self.tmp_floder_path / 'primary.minimap2_reference.gff3')
         self.opened_primary_gff = self.primary_gff_path.open('w')
         self.output.info('Running cDNA_cupcake sam_to_gff3')
         if not self.args.verbose:
-            sys.stdout = self.opened_log_file
             self.opened_log_file.write('cDNA_cupcake sam_to_gff3 info:\n')
-        sam_to_gff(str(self.primary_sam_path),
-                   self.opened_primary_gff, str(self.primary_fasta_path))
-        if not self.args.verbose:
-            sys.stdout = sys.__stdout__
+        with self.log_redirect():
+            sam_to_gff(str(self.primary_sam_path),
+                       self.opened_primary_gff, str(self.primary_fasta_path))
         self.opened_primary_gff.close()
         self.opened_primary_gff = self.primary_gff_path.open('r')
         self.gene_linked_region = read_gff(self.opened_primary_gff)
@@ -195,29 +189,32 @@ class Index(object):
             self.gene_linked_region[gene_id].update_info_id(full_link_id)
             self.linked_region_list.append(self.gene_linked_region[gene_id])
         del self.gene_linked_region
-        collect()
 
     def process_links(self) -> None:
         """Using multiply threads index each linked region."""
-        in_pool_threads = int(self.args.threads / len(self.link_id_list))
-        in_pool_threads = in_pool_threads if in_pool_threads else 1
-        out_pool_threads = int(self.args.threads / in_pool_threads)
+        in_pool_threads = max(
+            self.args.threads // max(len(self.link_id_list), 1), 1)
+        out_pool_threads = self.args.threads // in_pool_threads
         self.output.info(
             f'Calling {out_pool_threads} pools to index each region')
-        process_link_args = []
-        for link_id, linked_region in zip(
-                self.link_id_list, self.linked_region_list):
-            process_link_args.append((
-                link_id, linked_region, self.tmp_floder_path,
-                self.args.reference, self.args.input,
-                self.args.fastx, in_pool_threads))
-        del self.linked_region_list
-        collect()
-        with Pool(processes=out_pool_threads) as pool:
-            self.process_link_returns = pool.map(
-                index_each_link, process_link_args)
+        # start the longest linked regions first to shorten the idle tail
+        link_id_region_list = sorted(
+            zip(self.link_id_list, self.linked_region_list),
+            key=lambda link: sum(region.end - region.start
+                                 for region in link[1].flatten()),
+            reverse=True)
+        self.link_id_list = [link_id for link_id, _ in link_id_region_list]
+        process_link_args = [
+            (link_id, linked_region, self.tmp_floder_path,
+             self.args.reference, self.args.input,
+             self.args.fastx, in_pool_threads)
+            for link_id, linked_region in link_id_region_list]
+        del self.linked_region_list, link_id_region_list
+        with Pool(processes=out_pool_threads, initializer=init_worker,
+                  initargs=(self.args.input, in_pool_threads)) as pool:
+            self.process_link_returns = list(pool.imap(
+                index_each_link, process_link_args, chunksize=1))
         del process_link_args
-        collect()
 
     def write_sgp_index(self) -> None:
         """Write SGPhasing index."""
@@ -18,12 +18,13 @@ Classes:
   - Phase
 """
 
-from gc import collect
 from logging import getLogger
 from multiprocessing import Pool
 from pathlib import Path
 
+from SGPhasing.processor.phase_each_link import init_worker
 from SGPhasing.processor.phase_each_link import phase_each_link
+from SGPhasing.reader.read_fastx import check_fastx_index
 from SGPhasing.reader.read_index import read_index
 from SGPhasing.reader.read_xam import check_index
 from SGPhasing.sys_output import Output
@@ -58,7 +59,8 @@ class Phase(object):
             self.output.info(f'Creating temporary folder at {self.args.tmp}')
         self.opened_log_file = (
             self.tmp_floder_path / 'sgphasing.log').open('a')
-        self.args.input = check_index(self.args.input)
+        self.args.input = check_index(self.args.input, self.args.threads)
+        check_fastx_index(self.args.fastx)
 
     def read_sgp_index(self) -> None:
         """Read SGPhasing index."""
@@ -68,24 +70,31 @@ class Phase(object):
 
     def process_links(self) -> None:
         """Using multiply threads phase each linked region."""
-        in_pool_threads = int(self.args.threads / len(self.link_id_list))
-        in_pool_threads = in_pool_threads if in_pool_threads else 1
-        out_pool_threads = int(self.args.threads / in_pool_threads)
+        in_pool_threads = max(
+            self.args.threads // max(len(self.link_id_list), 1), 1)
+        out_pool_threads = self.args.threads // in_pool_threads
         self.output.info(
             f'Calling {out_pool_threads} pools to phase each region')
-        process_link_args = []
-        for link_id, positions_list, region_id_main_dict in zip(
+        process_link_args = [
+            (link_id, positions_list, region_id_main_dict,
+             self.tmp_floder_path, self.args.input,
+             self.args.fastx, in_pool_threads)
+            for link_id, positions_list, region_id_main_dict in zip(
                 self.link_id_list, self.positions_list_list,
-                self.region_id_main_dict_list):
-            process_link_args.append((
-                link_id, region_id_main_dict, self.tmp_floder_path,
-                self.args.input, self.args.fastx, in_pool_threads))
+                self.region_id_main_dict_list)]
+        # start the longest linked regions first to shorten the idle tail
+        process_link_args.sort(
+            key=lambda link_args: sum(
+                region_main_list[2] - region_main_list[1]
+                for region_main_list in link_args[2].values()),
+            reverse=True)
         del self.positions_list_list, self.region_id_main_dict_list
-        collect()
-        with Pool(processes=out_pool_threads) as pool:
-            pool.map(phase_each_link, process_link_args)
+        with Pool(processes=out_pool_threads, initializer=init_worker,
+                  initargs=(self.args.input, in_pool_threads)) as pool:
+            for _ in pool.imap_unordered(
+                    phase_each_link, process_link_args, chunksize=1):
+                pass
         del process_link_args
-        collect()
 
     def process(self) -> None:
         """Call the Phase object."""
@@ -22,7 +22,8 @@ from SGPhasing.writer.write_tsv import write_reads_bases_matrix
 def bam_to_matrix(input_type: str,
                   link_floder_path: Path,
                   positions_list: list,
-                  expand_lalign_bam: str) -> tuple:
+                  expand_lalign_bam: str,
+                  threads: int = 1) -> tuple:
     """Extract reads base matrix and write into tsv.
 
     Args:
@@ -32,13 +33,16 @@ def bam_to_matrix(input_type: str,
         positions_list (list): position list for each base.
         expand_lalign_bam (str): mapped to expand reference and
                                  left aligned bam path string.
+        threads (int): threads using for pileup, default 1.
 
     Returns:
         reads_id_list (list): extracted reads id in list.
-        reads_bases_matrix (list): extracted bases matrix for each read.
+        reads_bases_matrix (ndarray): extracted bases matrix for each read.
     """
+    # matrix columns and tsv header both follow the sorted positions
+    positions_list = sorted(positions_list)
     reads_id_list, reads_bases_matrix = (
-        extract_read_matrix(expand_lalign_bam, positions_list))
+        extract_read_matrix(expand_lalign_bam, positions_list, threads))
     reads_bases_matrix_path = (
         link_floder_path / f'linked_region.{input_type}.reads_bases.tsv')
     if input_type != 'reference':
@@ -12,13 +12,20 @@
 Functions:
   - collapse_isoforms_by_sam
   - get_most_supported_isoforms
+  - get_inputs_digest
+  - check_fastx_ids_unique
 """
 
+from hashlib import sha256
+from mmap import ACCESS_READ, mmap
 from pathlib import Path
+from shutil import copyfile
+from sys import exit
 
-from cupcake.tofu.utils import check_ids_unique
 from cupcake.tofu.branch.branch_simple2 import BranchSimple
 
+from SGPhasing.sys_output import output
+
 
 def collapse_isoforms_by_sam(input_sam: str,
                              input_fastx: str,
@@ -36,10 +43,17 @@ def collapse_isoforms_by_sam(input_sam: str,
         gff_path (str): primary_reference.collapsed.gff file path string.
         most_iso_id_list (list): most supported isoforms id in list.
     """
+    cache_dir = (tmp_dir / '.collapse_cache' /
+                 get_inputs_digest((input_sam, input_fastx), is_fq))
+    cache_gff_path = cache_dir / 'primary_reference.collapsed.gff'
+    cache_group_path = cache_dir / 'primary_reference.collapsed.group.txt'
+    if cache_dir.is_dir():
+        return str(cache_gff_path), get_most_supported_isoforms(
+            str(cache_group_path))
     opened_gff = (tmp_dir/'primary_reference.collapsed.gff').open('w')
     opened_group = (tmp_dir/'primary_reference.collapsed.group.txt').open('w')
     opened_ignore = (tmp_dir/'primary_reference.ignored_ids.txt').open('w')
-    check_ids_unique(input_fastx, is_fq=is_fq)
+    check_fastx_ids_unique(input_fastx, is_fq)
     branch_simple = BranchSimple(
         input_fastx, cov_threshold=1, min_aln_coverage=0.85,
         min_aln_identity=0.85, is_fq=is_fq, max_5_diff=1000, max_3_diff=100)
@@ -55,6 +69,11 @@ def collapse_isoforms_by_sam(input_sam: str,
     opened_gff.close()
     opened_group.close()
     opened_ignore.close()
+    cache_tmp_dir = cache_dir.with_suffix('.tmp')
+    cache_tmp_dir.mkdir(parents=True, exist_ok=True)
+    copyfile(opened_gff.name, cache_tmp_dir / cache_gff_path.name)
+    copyfile(opened_group.name, cache_tmp_dir / cache_group_path.name)
+    cache_tmp_dir.rename(cache_dir)
     return opened_gff.name, get_most_supported_isoforms(opened_group.name)
 
 
@@ -68,20 +87,85 @@ def get_most_supported_isoforms(input_group: str) -> list:
     Returns:
         most_iso_id_list (list): most supported isoforms id in list.
     """
-    most_iso_id_list = []
-    gene_iso_flncnum_dict = {}
-    with open(input_group, 'r') as opened_group:
+    gene_most_dict = {}
+    with open(input_group, 'rb', buffering=1 << 20) as opened_group:
         for eachline in opened_group:
-            full_iso_id, reads_id = eachline.strip().split()
-            pb, gene_id, iso_id = full_iso_id.split('.')
-            flnc_num = len(reads_id.split(','))
-            gene_iso_flncnum_dict.setdefault(
-                pb+'.'+gene_id, {}).update({iso_id: flnc_num})
-    for gene_id, gene_dict in gene_iso_flncnum_dict.items():
-        max_flnc_num, most_iso_id = 0, ''
-        for iso_id, flnc_num in gene_dict.items():
-            if flnc_num > max_flnc_num:
-                max_flnc_num = flnc_num
-                most_iso_id = iso_id
-        most_iso_id_list.append(gene_id+'.'+most_iso_id)
-    return most_iso_id_list
+            full_iso_id, reads_id = eachline.split(b'\t', 1)
+            gene_id, _ = full_iso_id.rsplit(b'.', 1)
+            flnc_num = reads_id.count(b',') + 1
+            most_flnc_iso = gene_most_dict.get(gene_id)
+            if most_flnc_iso is None or flnc_num > most_flnc_iso[0]:
+                gene_most_dict[gene_id] = (flnc_num, full_iso_id)
+    return [full_iso_id.decode()
+            for _, full_iso_id in gene_most_dict.values()]
+
+
+def get_inputs_digest(input_paths: tuple, is_fq: bool) -> str:
+    """Get sha256 digest of input files contents.
+
+    Args:
+        input_paths (tuple): input file path strings.
+        is_fq (bool): input fastx is in fastq format.
+
+    Returns:
+        (str): hex digest string.
+    """
+    digest = sha256(b'fastq' if is_fq else b'fasta')
+    for input_path in input_paths:
+        with open(input_path, 'rb') as opened_input:
+            for block in iter(lambda: opened_input.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def check_fastx_ids_unique(input_fastx: str, is_fq: bool) -> None:
+    """Check reads ids are unique in a plain fasta/q file.
+
+    The file is memory-mapped and scanned for record headers in C,
+    instead of being parsed record by record.
+
+    Args:
+        input_fastx (str): input fasta/q file path string.
+        is_fq (bool): input_fastx is in fastq format.
+    """
+    reads_id_set = set()
+    with open(input_fastx, 'rb') as opened_fastx:
+        if not opened_fastx.seek(0, 2):
+            return
+        with mmap(opened_fastx.fileno(), 0, access=ACCESS_READ) as mapped:
+            header_start, file_size = 0, len(mapped)
+            header_mark = b'@' if is_fq else b'>'
+            while header_start < file_size:
+                header_end = mapped.find(b'\n', header_start)
+                if header_end == -1:
+                    header_end = file_size
+                header = mapped[header_start:header_end]
+                if not header.strip():
+                    # skip blank lines, such as a trailing one
+                    header_start = header_end + 1
+                    continue
+                header_fields = header[1:].split(None, 1)
+                if header[:1] != header_mark or not header_fields:
+                    output.error(f'Input error: malformed record header '
+                                 f'{header.decode(errors="replace")!r} '
+                                 f'in {input_fastx}.')
+                    exit()
+                read_id = header_fields[0]
+                if read_id in reads_id_set:
+                    output.error(f'Input error: duplicate id '
+                                 f'{read_id.decode()} in {input_fastx}.')
+                    exit()
+                reads_id_set.add(read_id)
+                if is_fq:
+                    # header, sequence, plus and quality lines
+                    header_start = header_end
+                    for _ in range(3):
+                        header_start = mapped.find(b'\n', header_start+1)
+                        if header_start == -1:
+                            return
+                    header_start += 1
+                else:
+                    header_start = mapped.find(b'\n>', header_end)
+                    if header_start == -1:
+                        return
+                    header_start += 1
@@ -10,71 +10,39 @@
 """SGPhasing.processor gatk4.
 
 Functions:
-  - create_sequence_dictionary
-  - add_or_replace_read_groups
   - left_align_indels
   - haplotype_caller
 """
 
-from subprocess import PIPE, Popen, STDOUT
+from io import TextIOWrapper
+from subprocess import run, STDOUT
 
+from SGPhasing.sys_file import atomic_output, is_up_to_date
 
-def create_sequence_dictionary(reference: str) -> str:
-    """Call gatk4 for creating sequence dictionary.
 
-    Args:
-        reference (str): reference fasta file path string.
-
-    Returns:
-        (str): gatk4 print.
-    """
-    with Popen(['gatk', 'CreateSequenceDictionary', '--REFERENCE', reference],
-               stdout=PIPE, stderr=STDOUT) as proc:
-        return proc.stdout.read().decode('utf-8')
-
-
-def add_or_replace_read_groups(input_bam: str,
-                               output_bam: str,
-                               rglb: str,
-                               rgpl: str,
-                               rgpu: str,
-                               rgsm: str) -> str:
-    """Call gatk4 for addind or replacing read groups.
-
-    Args:
-        input_bam (str): input bam file path string.
-        output_bam (str): output bam file path string.
-        rglb (str): read-group library.
-        rgpl (str): read-group platform (e.g. ILLUMINA, SOLID).
-        rgpu (str): read-group platform unit (eg. run barcode).
-        rgsm (str): read-group sample name.
-
-    Returns:
-        (str): gatk4 print.
-    """
-    with Popen(['gatk', 'AddOrReplaceReadGroups', '--INPUT', input_bam,
-                '--OUTPUT', output_bam, '--RGLB', rglb, '--RGPL', rgpl,
-                '--RGPU', rgpu, '--RGSM', rgsm],
-               stdout=PIPE, stderr=STDOUT) as proc:
-        return proc.stdout.read().decode('utf-8')
-
-
-def left_align_indels(input_bam: str, output_bam: str, reference: str) -> str:
+def left_align_indels(input_bam: str,
+                      output_bam: str,
+                      reference: str,
+                      opened_log: TextIOWrapper = None) -> None:
     """Call gatk4 for left aligning indels.
 
     Args:
         input_bam (str): input bam file path string.
         output_bam (str): output bam file path string.
         reference (str): reference fasta file path string.
-
-    Returns:
-        (str): gatk4 print.
+        opened_log (TextIOWrapper): opened log file handle gatk4 print into,
+                                    default None for inheriting stdout.
     """
-    with Popen(['gatk', 'LeftAlignIndels',
-                '--disable-tool-default-read-filters', 'true',
-                '--input', input_bam, '--output', output_bam,
-                '--reference', reference], stdout=PIPE, stderr=STDOUT) as proc:
-        return proc.stdout.read().decode('utf-8')
+    # every argument except the output, recorded to decide reusing
+    options = ['--disable-tool-default-read-filters', 'true',
+               '--input', input_bam, '--reference', reference]
+    if is_up_to_date(output_bam, input_bam, reference, args=options):
+        return
+    if opened_log is not None:
+        opened_log.flush()
+    with atomic_output(output_bam, options) as tmp_bam:
+        run(['gatk', 'LeftAlignIndels', '--output', tmp_bam] + options,
+            stdout=opened_log, stderr=STDOUT, check=True)
 
 
 def haplotype_caller(input_bam: str,
@@ -83,7 +51,8 @@ def haplotype_caller(input_bam: str,
                      max_reads: int,
                      min_quality: int,
                      ploidy: int,
-                     threads: int = 1) -> str:
+                     threads: int = 1,
+                     opened_log: TextIOWrapper = None) -> None:
     """Call gatk4 for calling haplotype.
 
     Args:
@@ -94,14 +63,12 @@ def haplotype_caller(input_bam: str,
         min_quality (int): min quality number for --min-base-quality-score.
         ploidy (int): ploidy number for --sample-ploidy.
         threads (int): threads using for IntelPairHmm, default 1.
-
-    Returns:
-        (str): gatk4 print.
+        opened_log (TextIOWrapper): opened log file handle gatk4 print into,
+                                    default None for inheriting stdout.
     """
-    args = [
-        'gatk', '--java-options', "'-DGATK_STACKTRACE_ON_USER_EXCEPTION=true'",
-        'HaplotypeCaller', '--input', input_bam, '--output', output_vcf,
-        '--reference', reference,
+    # every argument except the output, recorded to decide reusing
+    options = [
+        '--input', input_bam, '--reference', reference,
         '--max-reads-per-alignment-start', str(max_reads),
         '--min-base-quality-score', str(min_quality),
         '--native-pair-hmm-threads', str(threads),
@@ -110,5 +77,12 @@ def haplotype_caller(input_bam: str,
         '--dont-use-soft-clipped-bases', 'true',
         '--max-alternate-alleles', str(ploidy*2),
         '--pcr-indel-model', 'AGGRESSIVE']
-    with Popen(' '.join(args), stdout=PIPE, stderr=STDOUT, shell=True) as proc:
-        return proc.stdout.read().decode('utf-8')
+    if is_up_to_date(output_vcf, input_bam, reference, args=options):
+        return
+    if opened_log is not None:
+        opened_log.flush()
+    with atomic_output(output_vcf, options) as tmp_vcf:
+        run(['gatk', '--java-options',
+             '-DGATK_STACKTRACE_ON_USER_EXCEPTION=true',
+             'HaplotypeCaller', '--output', tmp_vcf] + options,
+            stdout=opened_log, stderr=STDOUT, check=True)
@@ -13,22 +13,28 @@ Functions:
   - gff_to_fasta
 """
 
-from subprocess import PIPE, Popen, STDOUT
+from io import TextIOWrapper
+from subprocess import run, STDOUT
+
+from SGPhasing.sys_file import is_up_to_date
 
 
 def gff_to_fasta(input_gff: str,
                  reference: str,
-                 output_fasta: str) -> str:
+                 output_fasta: str,
+                 opened_log: TextIOWrapper = None) -> None:
     """Convert gff3 to fasta.
 
     Args:
         input_gff (str): input gff3 file path string.
         reference (str): reference fasta file path string.
         output_fasta (str): output fasta file path string.
-
-    Returns:
-        (str): gffread print.
+        opened_log (TextIOWrapper): opened log file handle gffread print into,
+                                    default None for inheriting stdout.
     """
-    with Popen(['gffread', input_gff, '-g', reference,
-                '-w', output_fasta], stdout=PIPE, stderr=STDOUT) as proc:
-        return proc.stdout.read().decode('utf-8')
+    if is_up_to_date(output_fasta, input_gff, reference):
+        return
+    if opened_log is not None:
+        opened_log.flush()
+    run(['gffread', input_gff, '-g', reference, '-w', output_fasta],
+        stdout=opened_log, stderr=STDOUT, check=True)
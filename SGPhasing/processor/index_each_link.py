@@ -10,18 +10,38 @@
 """SGPhasing.processor index each linked region.
 
 Functions:
+  - init_worker
   - index_each_link
 """
 
+from pysam import AlignmentFile
+
 from SGPhasing.processor.bam_to_matrix import bam_to_matrix
-from SGPhasing.processor.gatk4 import create_sequence_dictionary
 from SGPhasing.processor.gatk4 import haplotype_caller
 from SGPhasing.processor.gff_to_fasta import gff_to_fasta
-from SGPhasing.processor.region_to_bam import fastx_to_bam, region_to_bam
-from SGPhasing.reader.read_fastx import faidx
+from SGPhasing.processor.region_to_bam import fastx_pair_to_bam
+from SGPhasing.processor.region_to_bam import region_to_fastx
+from SGPhasing.reader.read_fastx import faidx, get_seq_dict
 from SGPhasing.reader.read_vcf import get_alt_positions
+from SGPhasing.reader.read_xam import open_xam
+from SGPhasing.sys_file import is_up_to_date
 from SGPhasing.threader.thread_haplotypes import onehot_decoder
 from SGPhasing.threader.thread_haplotypes import thread_haplotypes
+from SGPhasing.writer.write_fastx import write_fasta
+from SGPhasing.writer.write_xam import write_sequence_dictionary
+
+worker_opened_xam: AlignmentFile = None
+
+
+def init_worker(index_xam: str, threads: int = 1) -> None:
+    """Open input bam/cram once for each pool worker.
+
+    Args:
+        index_xam (str): input bam/cram file path string.
+        threads (int): threads using for htslib decompression, default 1.
+    """
+    global worker_opened_xam
+    worker_opened_xam = open_xam(index_xam, threads)
 
 
 def index_each_link(args_tuple: tuple) -> tuple:
@@ -50,52 +70,57 @@ def index_each_link(args_tuple: tuple) -> tuple:
     opened_minimap2_log = (link_floder_path / 'minimap2.log').open('w')
     opened_gatk4_log = (link_floder_path / 'gatk4.log').open('w')
 
-    link_gff_path = (
-        link_floder_path / 'linked_region.minimap2_reference.gff3')
-    linked_region.write_gff(str(link_gff_path))
-    link_fasta_path = link_floder_path / 'linked_region.reference.fasta'
-    opened_gffread_log.write(gff_to_fasta(
-        str(link_gff_path), reference, str(link_fasta_path)))
-
-    expanded_primary_region = linked_region.extend_primary()
-    expanded_primary_region.update_info_id(link_id)
-    opened_expand_gff = (
-        link_floder_path/'expanded_primary.minimap2_reference.gff3').open('w')
-    expanded_primary_region.write_gff(opened_expand_gff)
-    opened_expand_gff.close()
-    expand_fasta_path = link_floder_path / 'expanded_primary.reference.fasta'
-    opened_gffread_log.write(gff_to_fasta(
-        opened_expand_gff.name, reference, str(expand_fasta_path)))
+    # extract linked and expanded primary regions by one gffread call
+    combined_gff = str(
+        link_floder_path / 'combined.minimap2_reference.gff3')
+    linked_region.write_combined_gff(combined_gff, link_id)
+    combined_fasta = str(link_floder_path / 'combined.reference.fasta')
+    gff_to_fasta(combined_gff, reference, combined_fasta, opened_gffread_log)
     opened_gffread_log.close()
 
-    faidx(str(expand_fasta_path))
-    opened_gatk4_log.write(create_sequence_dictionary(str(expand_fasta_path)))
+    link_fasta = str(link_floder_path / 'linked_region.reference.fasta')
+    expand_fasta = str(
+        link_floder_path / 'expanded_primary.reference.fasta')
+    if not is_up_to_date(expand_fasta, combined_fasta):
+        id_seq_dict = get_seq_dict(combined_fasta)
+        with open(expand_fasta, 'w') as opened_expand_fasta:
+            write_fasta(opened_expand_fasta, link_id, id_seq_dict.pop(link_id))
+        with open(link_fasta, 'w') as opened_link_fasta:
+            for seq_id, sequence in id_seq_dict.items():
+                write_fasta(opened_link_fasta, seq_id, sequence)
+
+    if not is_up_to_date(f'{expand_fasta}.fai', expand_fasta):
+        faidx(expand_fasta)
+    expand_fasta_dict = str(
+        link_floder_path / 'expanded_primary.reference.dict')
+    if not is_up_to_date(expand_fasta_dict, expand_fasta):
+        write_sequence_dictionary(expand_fasta, expand_fasta_dict)
 
-    link_expand_lalign_bam = fastx_to_bam(
-        'reference', link_id, link_floder_path, str(link_fasta_path),
-        str(expand_fasta_path), opened_minimap2_log, opened_gatk4_log, threads)
-    index_expand_lalign_bam, reads_num = region_to_bam(
-        'index', link_id, linked_region, link_floder_path,
-        index_xam, index_fastx, str(expand_fasta_path),
-        opened_minimap2_log, opened_gatk4_log, threads)
+    index_link_fastx, reads_num = region_to_fastx(
+        'index', linked_region, link_floder_path,
+        index_xam, index_fastx, threads, worker_opened_xam)
+    # map linked regions and index reads by one minimap2 call
+    link_expand_lalign_bam, index_expand_lalign_bam = fastx_pair_to_bam(
+        link_id, link_floder_path, link_fasta, index_link_fastx,
+        expand_fasta, opened_minimap2_log, opened_gatk4_log, threads)
     opened_minimap2_log.close()
 
     ploidy = len(linked_region.Secondary_Regions_list) + 1
-    index_expand_vcf_path = (
+    index_expand_vcf = str(
         link_floder_path / 'linked_region.index.minimap2_expand.hapcal.vcf')
-    opened_gatk4_log.write(haplotype_caller(
-        index_expand_lalign_bam, str(index_expand_vcf_path),
-        str(expand_fasta_path), reads_num, 20, ploidy, threads))
+    haplotype_caller(
+        index_expand_lalign_bam, index_expand_vcf, expand_fasta,
+        reads_num, 20, ploidy, threads, opened_gatk4_log)
     opened_gatk4_log.close()
 
-    positions_list = get_alt_positions(str(index_expand_vcf_path), ploidy)
+    positions_list = get_alt_positions(index_expand_vcf, ploidy)
     if positions_list:
         link_reads_id_list, link_reads_bases_matrix = bam_to_matrix(
             'reference', link_floder_path,
-            positions_list, link_expand_lalign_bam)
+            positions_list, link_expand_lalign_bam, threads)
         index_reads_id_list, index_reads_bases_matrix = bam_to_matrix(
             'index', link_floder_path,
-            positions_list, index_expand_lalign_bam)
+            positions_list, index_expand_lalign_bam, threads)
 
         (clusters_indexes_array, sample_cluster_indexes,
          new_prototypes_array) = thread_haplotypes(
@@ -10,17 +10,82 @@
 """SGPhasing.processor minimap2.
 
 Functions:
+  - splice_index_path
+  - build_index
   - splice_mapper
   - genomic_mapper
 """
 
-from subprocess import PIPE, Popen, STDOUT
+from hashlib import md5
+from io import TextIOWrapper
+import os
+from os import environ
+from pathlib import Path
+from subprocess import CalledProcessError, PIPE, Popen, run, STDOUT
+
+from SGPhasing.sys_file import atomic_output, is_up_to_date
+from SGPhasing.writer.write_xam import sam_to_bam
+
+# -k and the preset are baked into a .mmi and ignored at mapping time
+SPLICE_INDEX_SUFFIX = '.k17.splice_hq.mmi'
+
+
+def splice_index_path(reference: str) -> str:
+    """Get minimap2 splice index path for reference.
+
+    The index sits next to the reference, or in the shared folder
+    given by the SGPHASING_MMI_CACHE environment variable.
+
+    Args:
+        reference (str): reference fasta file path string.
+
+    Returns:
+        index_file (str): minimap2 splice index file path string.
+    """
+    cache_dir = environ.get('SGPHASING_MMI_CACHE')
+    if not cache_dir:
+        return reference + SPLICE_INDEX_SUFFIX
+    reference_path = Path(reference).resolve()
+    path_hash = md5(str(reference_path).encode()).hexdigest()[:8]
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    return str(Path(cache_dir) /
+               f'{reference_path.name}.{path_hash}{SPLICE_INDEX_SUFFIX}')
+
+
+def build_index(reference: str,
+                threads: int = 1,
+                opened_log: TextIOWrapper = None) -> None:
+    """Call minimap2 to build splice index if not up to date.
+
+    Args:
+        reference (str): reference fasta file path string.
+        threads (int): threads using for minimap2, default 1.
+        opened_log (TextIOWrapper): opened log file handle minimap2 print
+                                    into, default None for inheriting stdout.
+    """
+    index_file = splice_index_path(reference)
+    # every argument except the output, recorded to decide reusing
+    options = ['-k', '17', '-x', 'splice:hq', '-t', str(threads), reference]
+    if is_up_to_date(index_file, reference, args=options):
+        return
+    if opened_log is not None:
+        opened_log.flush()
+    with atomic_output(index_file, options) as tmp_index_file:
+        run(['minimap2', '-d', tmp_index_file] + options,
+            stdout=opened_log, stderr=STDOUT, check=True)
+    # warm the page cache for the splice mapping that follows,
+    # posix_fadvise is not available on macOS
+    if hasattr(os, 'posix_fadvise'):
+        with open(index_file, 'rb') as opened_index:
+            os.posix_fadvise(
+                opened_index.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
 
 
 def splice_mapper(reference: str,
                   input_fastx: str,
                   output_sam: str,
-                  threads: int = 1) -> str:
+                  threads: int = 1,
+                  opened_log: TextIOWrapper = None) -> None:
     """Call minimap2 for splice mapping.
 
     Args:
@@ -28,35 +93,70 @@ def splice_mapper(reference: str,
         input_fastx (str): input sequences fasta/q file path string.
         output_sam (str): output sam file path string.
         threads (int): threads using for minimap2, default 1.
-
-    Returns:
-        (str): minimap2 print.
+        opened_log (TextIOWrapper): opened log file handle minimap2 print
+                                    into, default None for inheriting stdout.
     """
-    with Popen(['minimap2', '-k', '17', '-uf', '-a', '-o', output_sam,
-                '--MD', '-t', str(threads), '-x', 'splice:hq',
-                reference+'.mmi', input_fastx],
-               stdout=PIPE, stderr=STDOUT) as proc:
-        return proc.stdout.read().decode('utf-8')
+    index_file = splice_index_path(reference)
+    # every argument except the output, recorded to decide reusing
+    options = ['-k', '17', '-uf', '-a', '--MD', '-t', str(threads),
+               '-x', 'splice:hq', index_file, input_fastx]
+    if is_up_to_date(output_sam, index_file, input_fastx, args=options):
+        return
+    if opened_log is not None:
+        opened_log.flush()
+    with atomic_output(output_sam, options) as tmp_sam:
+        run(['minimap2', '-o', tmp_sam] + options,
+            stdout=opened_log, stderr=STDOUT, check=True)
 
 
 def genomic_mapper(reference: str,
                    input_fastx: str,
-                   output_sam: str,
+                   output_bam: str,
                    preset: str,
-                   threads: int = 1) -> str:
-    """Call minimap2 for genomic mapping.
+                   threads: int = 1,
+                   opened_log: TextIOWrapper = None) -> None:
+    """Call minimap2 for genomic mapping and sort into bam.
+
+    minimap2 writes into a pipe that pysam.sort reads from,
+    so the intermediate sam never lands on disk.
 
     Args:
         reference (str): reference fasta file path string.
         input_fastx (str): input sequences fasta/q file path string.
-        output_sam (str): output sam file path string.
+        output_bam (str): output sorted bam file path string.
         preset (str): minimap2 preset.
-        threads (int): threads using for minimap2, default 1.
-
-    Returns:
-        (str): minimap2 print.
+        threads (int): threads using for minimap2 and pysam, default 1.
+        opened_log (TextIOWrapper): opened log file handle minimap2 print
+                                    into, default None for inheriting stdout.
     """
-    with Popen(['minimap2', '-k', '17', '-a', '-o', output_sam,
-                '--MD', '-t', str(threads), '-x', preset,
-                reference, input_fastx], stdout=PIPE, stderr=STDOUT) as proc:
-        return proc.stdout.read().decode('utf-8')
+    # every argument except the output, recorded to decide reusing,
+    # secondary alignments are filtered by pileup and HaplotypeCaller
+    options = ['-k', '17', '-a', '--MD', '--secondary=no',
+               '-t', str(threads), '-x', preset, reference, input_fastx]
+    if is_up_to_date(output_bam, reference, input_fastx, args=options):
+        return
+    if opened_log is not None:
+        opened_log.flush()
+    args = ['minimap2'] + options
+    with atomic_output(output_bam, options) as tmp_bam, \
+            Popen(args, stdout=PIPE, stderr=opened_log) as proc:
+        # pysam.sort reads the pipe as its stdin, a named pipe would block
+        # it in open, holding the GIL, if minimap2 exits before writing
+        stdin_fd = os.dup(0)
+        os.dup2(proc.stdout.fileno(), 0)
+        try:
+            sam_to_bam('-', reference, tmp_bam, threads)
+        except Exception as error:
+            os.dup2(stdin_fd, 0)
+            proc.stdout.close()
+            # a negative return code is the SIGPIPE of the closed pipe
+            if proc.wait() > 0:
+                raise CalledProcessError(
+                    proc.returncode, args) from error
+            raise
+        finally:
+            os.dup2(stdin_fd, 0)
+            os.close(stdin_fd)
+            proc.stdout.close()
+        if proc.wait():
+            raise CalledProcessError(proc.returncode, args)
@@ -10,16 +10,32 @@
 """SGPhasing.processor phase each linked region.
 
 Functions:
+  - init_worker
   - phase_each_link
 """
 
-from gc import collect
+from pysam import AlignmentFile
 
 from SGPhasing.processor.bam_to_matrix import bam_to_matrix
-from SGPhasing.processor.gatk4 import create_sequence_dictionary
 from SGPhasing.processor.region_to_bam import region_to_bam
 from SGPhasing.reader.read_fastx import faidx
+from SGPhasing.reader.read_xam import open_xam
 from SGPhasing.Regions import Linked_Region, Region
+from SGPhasing.sys_file import is_up_to_date
+from SGPhasing.writer.write_xam import write_sequence_dictionary
+
+worker_opened_xam: AlignmentFile = None
+
+
+def init_worker(index_xam: str, threads: int = 1) -> None:
+    """Open input bam/cram once for each pool worker.
+
+    Args:
+        index_xam (str): input bam/cram file path string.
+        threads (int): threads using for htslib decompression, default 1.
+    """
+    global worker_opened_xam
+    worker_opened_xam = open_xam(index_xam, threads)
 
 
 def phase_each_link(args_tuple: tuple):
@@ -44,16 +60,14 @@ def phase_each_link(args_tuple: tuple):
     opened_minimap2_log = (link_floder_path / 'minimap2.log').open('a')
     opened_gatk4_log = (link_floder_path / 'gatk4.log').open('a')
 
-    expand_fasta_path = link_floder_path / 'expanded_primary.reference.fasta'
-    expand_fasta_fai_path = (
-        link_floder_path / 'expanded_primary.reference.fasta.fai')
-    if not expand_fasta_fai_path.exists():
-        faidx(str(expand_fasta_path))
-    expand_fasta_dict_path = (
+    expand_fasta = str(
+        link_floder_path / 'expanded_primary.reference.fasta')
+    if not is_up_to_date(f'{expand_fasta}.fai', expand_fasta):
+        faidx(expand_fasta)
+    expand_fasta_dict = str(
         link_floder_path / 'expanded_primary.reference.dict')
-    if not expand_fasta_dict_path.exists():
-        opened_gatk4_log.write(
-            create_sequence_dictionary(str(expand_fasta_path)))
+    if not is_up_to_date(expand_fasta_dict, expand_fasta):
+        write_sequence_dictionary(expand_fasta, expand_fasta_dict)
 
     secondary_regions_list = []
     for region_id, region_main_list in region_id_main_dict.items():
@@ -65,11 +79,11 @@ def phase_each_link(args_tuple: tuple):
     linked_region = Linked_Region(primary_region)
     linked_region.update_secondary(secondary_regions_list)
     del primary_region, secondary_regions_list
-    collect()
 
     phase_expand_lalign_bam, reads_num = region_to_bam(
         'phase', link_id, linked_region, link_floder_path,
-        index_xam, index_fastx, str(expand_fasta_path),
-        opened_minimap2_log, opened_gatk4_log, threads)
+        index_xam, index_fastx, expand_fasta,
+        opened_minimap2_log, opened_gatk4_log, threads, worker_opened_xam)
     phase_reads_id_list, phase_reads_bases_matrix = bam_to_matrix(
-        'phase', link_floder_path, positions_list, phase_expand_lalign_bam)
+        'phase', link_floder_path, positions_list,
+        phase_expand_lalign_bam, threads)
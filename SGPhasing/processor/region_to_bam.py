@@ -11,19 +11,26 @@
 
 Functions:
   - region_to_bam
+  - region_to_fastx
   - fastx_to_bam
+  - fastx_pair_to_bam
+  - lalign_bam
 """
 
 from io import TextIOWrapper
 from pathlib import Path
 
-from SGPhasing.processor.gatk4 import add_or_replace_read_groups
+from pysam import AlignmentFile
+
 from SGPhasing.processor.gatk4 import left_align_indels
 from SGPhasing.processor.minimap2 import genomic_mapper
+from SGPhasing.processor.seqkit import grep_fastx, SEQKIT_PATH
+from SGPhasing.reader.read_bed import merge_region
 from SGPhasing.reader.read_fastx import open_fastx
-from SGPhasing.reader.read_xam import open_xam
+from SGPhasing.reader.read_xam import fetch_regions, open_xam
 from SGPhasing.Regions import Linked_Region
-from SGPhasing.writer import write_fastx, write_xam
+from SGPhasing.writer import write_fastx
+from SGPhasing.writer.write_xam import add_read_group, split_read_group
 
 
 def region_to_bam(input_type: str,
@@ -35,7 +42,8 @@ def region_to_bam(input_type: str,
                   reference: str,
                   opened_minimap2_log: TextIOWrapper,
                   opened_gatk4_log: TextIOWrapper,
-                  threads: int = 1) -> tuple:
+                  threads: int = 1,
+                  opened_input_xam: AlignmentFile = None) -> tuple:
     """Extract reads and run fastx_to_bam.
 
     Args:
@@ -50,37 +58,86 @@ def region_to_bam(input_type: str,
         opened_minimap2_log (TextIOWrapper): opened minimap2 log file handle.
         opened_gatk4_log (TextIOWrapper): opened gatk4 log file handle.
         threads (int): threads using for minimap2 and pysam, default 1.
+        opened_input_xam (AlignmentFile): already opened input_xam handle
+                                          to reuse, default None.
 
     Returns:
         input_expand_lalign_bam (str): input fasta/q left aligned bam
                                        file path string.
         reads_num (int): extracted reads number.
     """
-    link_reads_set = set()
-    opened_input_xam, input_xam_format = open_xam(input_xam)
-    for read in opened_input_xam.fetch(linked_region.Primary_Region.chrom,
-                                       linked_region.Primary_Region.start,
-                                       linked_region.Primary_Region.end):
-        link_reads_set.add(read.query_name)
-    for region in linked_region.Secondary_Regions_list:
-        for read in opened_input_xam.fetch(
-                region.chrom, region.start, region.end):
-            link_reads_set.add(read.query_name)
-    opened_input_xam.close()
+    input_fastx_path, reads_num = region_to_fastx(
+        input_type, linked_region, link_floder_path,
+        input_xam, input_fastx, threads, opened_input_xam)
+    input_expand_lalign_bam = fastx_to_bam(
+        input_type, link_id, link_floder_path, input_fastx_path,
+        reference, opened_minimap2_log, opened_gatk4_log, threads)
+    return input_expand_lalign_bam, reads_num
+
+
+def region_to_fastx(input_type: str,
+                    linked_region: Linked_Region,
+                    link_floder_path: Path,
+                    input_xam: str,
+                    input_fastx: str,
+                    threads: int = 1,
+                    opened_input_xam: AlignmentFile = None) -> tuple:
+    """Extract reads of linked region into fasta/q.
+
+    Args:
+        input_type (str): input fasta/q type string,
+                          in ('reference', 'index', 'phase').
+        linked_region (Linked_Region): linked region.
+        link_floder_path (Path): linked region floder Path.
+        input_xam (str): input bam/cram file path string.
+        input_fastx (str): input fasta/q file path string.
+        threads (int): threads using for pysam and seqkit, default 1.
+        opened_input_xam (AlignmentFile): already opened input_xam handle
+                                          to reuse, default None.
+
+    Returns:
+        input_fastx_path (str): extracted fasta/q file path string.
+        reads_num (int): extracted reads number.
+    """
+    chr_region = {}
+    for region in linked_region.flatten():
+        chr_region.setdefault(region.chrom, []).append(
+            (region.start, region.end))
+    is_reused = opened_input_xam is not None
+    if not is_reused:
+        opened_input_xam = open_xam(input_xam, threads)
+    link_reads_set = {
+        read.query_name for read in fetch_regions(
+            opened_input_xam, merge_region(chr_region))}
+    if not is_reused:
+        opened_input_xam.close()
 
     opened_input_fastx, input_fastx_format = open_fastx(input_fastx)
     input_fastx_path = (
-        link_floder_path /
-        (f'linked_region.{input_type}.' + input_fastx_format))
-    write_fastx.write_partial_fastx(
-        opened_input_fastx, input_fastx_path.open('w'),
-        input_fastx_format, link_reads_set)
-    opened_input_fastx.close()
+        link_floder_path / f'linked_region.{input_type}.{input_fastx_format}')
+    if (not input_fastx.endswith('.gz') and
+            Path(f'{input_fastx}.fai').is_file()):
+        # seek only the linked reads through the index built in prepare
+        opened_input_fastx.close()
+        write_fastx.write_indexed_fastx(
+            input_fastx, input_fastx_path.open('wb'),
+            input_fastx_format, link_reads_set)
+    elif SEQKIT_PATH:
+        # let seqkit scan the whole input fasta/q in C when available
+        opened_input_fastx.close()
+        reads_id_path = (
+            link_floder_path / f'linked_region.{input_type}.reads_id.txt')
+        reads_id_path.write_text(
+            ''.join(f'{read_id}\n' for read_id in link_reads_set))
+        grep_fastx(input_fastx, str(input_fastx_path),
+                   str(reads_id_path), threads)
+    else:
+        write_fastx.write_partial_fastx(
+            opened_input_fastx, input_fastx_path.open('wb'),
+            input_fastx_format, link_reads_set)
+        opened_input_fastx.close()
 
-    input_expand_lalign_bam = fastx_to_bam(
-        input_type, link_id, link_floder_path, str(input_fastx_path),
-        reference, opened_minimap2_log, opened_gatk4_log, threads)
-    return input_expand_lalign_bam, len(link_reads_set)
+    return str(input_fastx_path), len(link_reads_set)
 
 
 def fastx_to_bam(input_type: str,
@@ -114,28 +171,104 @@ def fastx_to_bam(input_type: str,
         minimap2_preset = 'map-ont'
     else:
         exit()
-    input_expand_sam_path = (
-        link_floder_path / f'linked_region.{input_type}.minimap2_expand.sam')
-    opened_minimap2_log.write(genomic_mapper(
-        reference, input_fastx, str(input_expand_sam_path),
-        minimap2_preset, threads))
-
     input_expand_bam_path = (
         link_floder_path / f'linked_region.{input_type}.minimap2_expand.bam')
-    write_xam.sam_to_bam(str(input_expand_sam_path), reference,
-                         str(input_expand_bam_path), threads)
+    genomic_mapper(reference, input_fastx, str(input_expand_bam_path),
+                   minimap2_preset, threads, opened_minimap2_log)
 
     input_expand_group_bam_path = (
         link_floder_path /
         f'linked_region.{input_type}.minimap2_expand.group.bam')
-    opened_gatk4_log.write(add_or_replace_read_groups(
+    add_read_group(
         str(input_expand_bam_path), str(input_expand_group_bam_path),
-        input_type, 'SGPhasing', link_id, '0'))
+        input_type, 'SGPhasing', link_id, '0', threads)
+    return lalign_bam(input_type, link_floder_path,
+                      str(input_expand_group_bam_path),
+                      reference, opened_gatk4_log)
+
 
+def fastx_pair_to_bam(link_id: str,
+                      link_floder_path: Path,
+                      reference_fastx: str,
+                      index_fastx: str,
+                      reference: str,
+                      opened_minimap2_log: TextIOWrapper,
+                      opened_gatk4_log: TextIOWrapper,
+                      threads: int = 1) -> tuple:
+    """Run one minimap2 for reference and index fasta/q to left aligned bams.
+
+    Both inputs share the asm20 preset, so their reads are tagged with
+    the input type, mapped together and split back by that tag.
+
+    Args:
+        link_id (str): link_id string.
+        link_floder_path (Path): linked region floder Path.
+        reference_fastx (str): linked regions fasta file path string.
+        index_fastx (str): extracted index fasta/q file path string.
+        reference (str): reference fasta file path string.
+        opened_minimap2_log (TextIOWrapper): opened minimap2 log file handle.
+        opened_gatk4_log (TextIOWrapper): opened gatk4 log file handle.
+        threads (int): threads using for minimap2 and pysam, default 1.
+
+    Returns:
+        reference_expand_lalign_bam (str): reference fasta left aligned bam
+                                           file path string.
+        index_expand_lalign_bam (str): index fasta/q left aligned bam
+                                       file path string.
+    """
+    input_type_fastx_dict = {
+        'reference': reference_fastx, 'index': index_fastx}
+    combined_fastx_path = link_floder_path / 'linked_region.combined.fastx'
+    with combined_fastx_path.open('wb') as opened_combined_fastx:
+        for input_type, input_fastx in input_type_fastx_dict.items():
+            opened_input_fastx, input_fastx_format = open_fastx(input_fastx)
+            write_fastx.write_tagged_fastx(
+                opened_input_fastx, opened_combined_fastx,
+                input_fastx_format, input_type)
+            opened_input_fastx.close()
+    combined_expand_bam_path = (
+        link_floder_path / 'linked_region.combined.minimap2_expand.bam')
+    genomic_mapper(reference, str(combined_fastx_path),
+                   str(combined_expand_bam_path), 'asm20',
+                   threads, opened_minimap2_log)
+
+    input_type_group_bam_dict = {
+        input_type: str(
+            link_floder_path /
+            f'linked_region.{input_type}.minimap2_expand.group.bam')
+        for input_type in input_type_fastx_dict}
+    split_read_group(str(combined_expand_bam_path), input_type_group_bam_dict,
+                     'SGPhasing', link_id, '0', threads)
+    return tuple(
+        lalign_bam(input_type, link_floder_path, input_expand_group_bam,
+                   reference, opened_gatk4_log)
+        for input_type, input_expand_group_bam in
+        input_type_group_bam_dict.items())
+
+
+def lalign_bam(input_type: str,
+               link_floder_path: Path,
+               input_expand_group_bam: str,
+               reference: str,
+               opened_gatk4_log: TextIOWrapper) -> str:
+    """Run gatk4 LeftAlignIndels on read grouped bam.
+
+    Args:
+        input_type (str): input fasta/q type string,
+                          in ('reference', 'index', 'phase').
+        link_floder_path (Path): linked region floder Path.
+        input_expand_group_bam (str): read grouped bam file path string.
+        reference (str): reference fasta file path string.
+        opened_gatk4_log (TextIOWrapper): opened gatk4 log file handle.
+
+    Returns:
+        input_expand_lalign_bam (str): input fasta/q left aligned bam
+                                       file path string.
+    """
     input_expand_lalign_bam_path = (
         link_floder_path /
         f'linked_region.{input_type}.minimap2_expand.lalign.bam')
-    opened_gatk4_log.write(left_align_indels(
-        str(input_expand_group_bam_path), str(input_expand_lalign_bam_path),
-        reference))
+    left_align_indels(
+        input_expand_group_bam, str(input_expand_lalign_bam_path),
+        reference, opened_gatk4_log)
     return str(input_expand_lalign_bam_path)
@@ -11,18 +11,16 @@
 
 Functions:
   - sam_to_gff
-  - sam_record_to_gff_record
+  - sam_record_to_gff_lines
 """
 
 from io import TextIOWrapper
 from sys import stderr
 
-from BCBio import GFF as BCBio_GFF
-from Bio import SeqIO
-from Bio.Seq import Seq
-from Bio.SeqFeature import SeqFeature, FeatureLocation
-from Bio.SeqRecord import SeqRecord
-from cupcake.io.BioReaders import GMAPSAMReader, GMAPSAMRecord
+import pysam
+
+# cigar operations consuming the reference
+CIGAR_MATCH_OPS = (pysam.CMATCH, pysam.CEQUAL, pysam.CDIFF)
 
 
 def sam_to_gff(input_sam: str,
@@ -37,72 +35,79 @@ def sam_to_gff(input_sam: str,
     """
     read_id_len_dict = {}
     if input_fasta:
-        read_id_len_dict = {
-            read.id: len(read.seq)
-            for read in SeqIO.parse(open(input_fasta), 'fasta')}
-    records = [sam_record_to_gff_record(record, 'sgphasing_tmp')
-               for record in GMAPSAMReader(input_sam, True,
-                                           query_len_dict=read_id_len_dict)]
-    BCBio_GFF.write([record for record in records if record is not None],
-                    opened_gff)
+        with pysam.FastxFile(input_fasta) as opened_fasta:
+            read_id_len_dict = {
+                read.name: len(read.sequence) for read in opened_fasta}
+    gff_lines = ['##gff-version 3\n']
+    with pysam.AlignmentFile(input_sam, 'r', check_sq=False) as opened_sam:
+        for sam_record in opened_sam.fetch(until_eof=True):
+            gff_lines.extend(sam_record_to_gff_lines(
+                sam_record, read_id_len_dict, 'sgphasing_tmp'))
+    opened_gff.writelines(gff_lines)
 
 
-def sam_record_to_gff_record(sam_record: GMAPSAMRecord,
-                             source: str = 'sgphasing_tmp') -> SeqRecord:
-    """Convert sam record to gff3 record.
+def sam_record_to_gff_lines(sam_record: pysam.AlignedSegment,
+                            read_id_len_dict: dict,
+                            source: str = 'sgphasing_tmp') -> list:
+    """Convert sam record to gff3 gene, mRNA and exon lines.
 
     Args:
-        sam_record (GMAPSAMRecord): BioReaders GMAPSAMRecord.
+        sam_record (AlignedSegment): pysam aligned read.
+        read_id_len_dict (dict): read id as key and read length as value.
         source (str): gff3 source, default 'sgphasing_tmp'.
 
     Returns:
-        gff_record (SeqRecord): SeqRecord ready to be written as GFF3.
+        gff_lines (list): gff3 line strings ending with newline.
     """
-    if sam_record.sID == '*':
-        print(f'Skipping {sam_record.qID} because unmapped.', file=stderr)
-        return None
-    strand = 1 if sam_record.flag.strand == '+' else -1
-    matches_num = sam_record.num_mat_or_sub - sam_record.num_nonmatches
-    mismatches_num = sam_record.num_nonmatches
-    indels_num = sam_record.num_ins + sam_record.num_del
-    coverage_str = '{0:.2f}'.format(
-        sam_record.qCoverage*10**2) if sam_record.qCoverage else 'NA'
-    identity_str = '{0:.2f}'.format(sam_record.identity*10**2)
+    query_id = sam_record.query_name
+    if sam_record.is_unmapped:
+        print(f'Skipping {query_id} because unmapped.', file=stderr)
+        return []
+    chrom = sam_record.reference_name
+    strand = '-' if sam_record.is_reverse else '+'
 
-    gene_qualifiers = {'source': source,
-                       'ID': sam_record.qID,
-                       'Name': sam_record.qID}  # for gene record
-    mRNA_qualifiers = {'source': source,
-                       'ID': sam_record.qID + '.mRNA',
-                       'Name': sam_record.qID + '.mRNA',
-                       'Parent': sam_record.qID,
-                       'coverage': coverage_str,
-                       'identity': identity_str,
-                       'matches': matches_num,
-                       'mismatches': mismatches_num,
-                       'indels': indels_num}
+    exons_list, mat_or_sub_num, ins_num, del_num = [], 0, 0, 0
+    exon_start = exon_end = sam_record.reference_start
+    for operation, length in sam_record.cigartuples:
+        if operation in CIGAR_MATCH_OPS:
+            mat_or_sub_num += length
+            exon_end += length
+        elif operation == pysam.CDEL:
+            del_num += length
+            exon_end += length
+        elif operation == pysam.CINS:
+            ins_num += length
+        elif operation == pysam.CREF_SKIP:
+            exons_list.append((exon_start, exon_end))
+            exon_start = exon_end = exon_end + length
+    exons_list.append((exon_start, exon_end))
 
-    # gene line, one per record
-    top_feature = SeqFeature(
-        FeatureLocation(sam_record.sStart, sam_record.sEnd),
-        type='gene', strand=strand, qualifiers=gene_qualifiers)
-    # mRNA line, one per record
-    top_feature.sub_features = [
-        SeqFeature(
-            FeatureLocation(sam_record.sStart, sam_record.sEnd),
-            type="mRNA", strand=strand, qualifiers=mRNA_qualifiers)]
-
-    # exon lines, as many exons per record
-    for exon_id, exon in enumerate(sam_record.segments):
-        exon_id_str = '{0}.exon{1}'.format(sam_record.qID, exon_id+1)
-        exon_qual = {'source': source, 'ID': exon_id_str, 'Name': exon_id_str}
-        top_feature.sub_features.append(SeqFeature(
-            FeatureLocation(exon.start, exon.end),
-            type='exon', strand=strand, qualifiers=exon_qual))
+    edit_num = (sam_record.get_tag('NM') if sam_record.has_tag('NM')
+                else ins_num + del_num)
+    mismatches_num = max(edit_num - ins_num - del_num, 0)
+    matches_num = mat_or_sub_num - mismatches_num
+    indels_num = ins_num + del_num
+    identity_str = '{0:.2f}'.format(
+        matches_num / (mat_or_sub_num + indels_num) * 10**2)
+    query_len = read_id_len_dict.get(query_id)
+    coverage_str = '{0:.2f}'.format(
+        sam_record.query_alignment_length / query_len * 10**2
+        ) if query_len else 'NA'
 
-    length = sum(exon.end - exon.start for exon in sam_record.segments)
-    # DO NOT CARE since sequence is not written in GFF3
-    fake_sequence = Seq('A'*length)
-    gff_record = SeqRecord(fake_sequence, sam_record.sID)
-    gff_record.features = [top_feature]
-    return gff_record
+    region_prefix = f'{chrom}\t{source}\t'
+    region_suffix = f'\t.\t{strand}\t.\t'
+    record_start, record_end = sam_record.reference_start + 1, exon_end
+    gff_lines = [
+        f'{region_prefix}gene\t{record_start}\t{record_end}{region_suffix}'
+        f'ID={query_id};Name={query_id}\n',
+        f'{region_prefix}mRNA\t{record_start}\t{record_end}{region_suffix}'
+        f'ID={query_id}.mRNA;Name={query_id}.mRNA;Parent={query_id};'
+        f'coverage={coverage_str};identity={identity_str};'
+        f'matches={matches_num};mismatches={mismatches_num};'
+        f'indels={indels_num}\n']
+    for exon_id, (exon_start, exon_end) in enumerate(exons_list, 1):
+        gff_lines.append(
+            f'{region_prefix}exon\t{exon_start+1}\t{exon_end}{region_suffix}'
+            f'ID={query_id}.exon{exon_id};Name={query_id}.exon{exon_id};'
+            f'Parent={query_id}\n')
+    return gff_lines
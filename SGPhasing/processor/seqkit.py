@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Shang Xie.
+# All rights reserved.
+#
+# This file is part of the SGPhasing distribution and
+# governed by your choice of the "SGPhasing License Agreement"
+# or the "GNU General Public License v3.0".
+# Please see the LICENSE file that should
+# have been included as part of this package.
+"""SGPhasing.processor seqkit.
+
+Functions:
+  - grep_fastx
+"""
+
+from io import TextIOWrapper
+from shutil import which
+from subprocess import run, STDOUT
+
+SEQKIT_PATH = which('seqkit')
+
+
+def grep_fastx(input_fastx: str,
+               output_fastx: str,
+               reads_id_file: str,
+               threads: int = 1,
+               opened_log: TextIOWrapper = None) -> None:
+    """Call seqkit for extracting fasta/q records by id.
+
+    Args:
+        input_fastx (str): input fasta/q file path string.
+        output_fastx (str): output fasta/q file path string.
+        reads_id_file (str): reads id file path string, one id per line.
+        threads (int): threads using for seqkit, default 1.
+        opened_log (TextIOWrapper): opened log file handle seqkit print into,
+                                    default None for inheriting stdout.
+    """
+    if opened_log is not None:
+        opened_log.flush()
+    run([SEQKIT_PATH, 'grep', '--threads', str(threads), '--line-width', '0',
+         '--pattern-file', reads_id_file, '--out-file', output_fastx,
+         input_fastx], stdout=opened_log, stderr=STDOUT, check=True)
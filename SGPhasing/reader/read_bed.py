@@ -12,8 +12,7 @@
 Functions:
   - open_bed
   - merge_region
-  - unfold_region
-  - fold_region
+  - add_region
 """
 
 
@@ -27,59 +26,63 @@ def open_bed(input_bed: str) -> dict:
         chr_region (dict): chrom as key and region list as value.
     """
     chr_region = {}
-    with open(input_bed, 'r') as opened_bed:
+    with open(input_bed, 'r', buffering=1 << 20) as opened_bed:
         for eachline in opened_bed:
-            if eachline[0] != '#':
-                sp = eachline.strip().split()
-                # chrom chromStart chromEnd name score strand
-                chr_region.setdefault(sp[0], []).append(
-                    (int(sp[1]), int(sp[2])))
+            if eachline.startswith(('#', 'track', 'browser')):
+                continue
+            # chrom chromStart chromEnd, the optional fields are not split
+            sp = eachline.split(None, 3)
+            if len(sp) < 3:
+                continue
+            region_list = chr_region.get(sp[0])
+            if region_list is None:
+                region_list = chr_region[sp[0]] = []
+            region_list.append((int(sp[1]), int(sp[2])))
     return merge_region(chr_region)
 
 
 def merge_region(chr_region: dict) -> dict:
-    """Merge overlapped regions.
+    """Merge overlapped or adjacent regions.
 
     Args:
-        chr_region (dict): chrom as key and region list as value.
+        chr_region (dict): chrom as key and (start, end) half-open
+                           region list as value.
 
     Returns:
-        chr_region (dict): chrom as key and region list as value.
+        chr_region (dict): chrom as key and sorted merged region list
+                           as value.
     """
-    return {chrom: fold_region(unfold_region(region_list))
-            for chrom, region_list in chr_region.items()}
-
-
-def unfold_region(region_list: list) -> set:
-    """Turn region_list into position_set.
-
-    Args:
-        region_list (list): (start, end) tuple list for each region.
+    merged_chr_region = {}
+    for chrom, region_list in chr_region.items():
+        merged_list = []
+        for start, end in sorted(region_list):
+            if merged_list and start <= merged_list[-1][1]:
+                if end > merged_list[-1][1]:
+                    merged_list[-1] = (merged_list[-1][0], end)
+            else:
+                merged_list.append((start, end))
+        merged_chr_region[chrom] = merged_list
+    return merged_chr_region
 
-    Returns:
-        position_set (set): set of positions.
-    """
-    position_set = set()
-    for region_start, region_end in region_list:
-        position_set |= set(range(region_start, region_end))
-    return position_set
 
+def add_region(chr_region: dict, chrom: str, start: int, end: int) -> None:
+    """Add a region, merging it into the last one when they overlap.
 
-def fold_region(position_set: set) -> list:
-    """Turn position_set into region_list.
+    Coordinate sorted input keeps the lists as short as the merged
+    regions, out of order regions are appended for merge_region.
 
     Args:
-        position_set (set): set of positions.
-
-    Returns:
-        region_list (list): (start, end) tuple list for each region.
+        chr_region (dict): chrom as key and (start, end) half-open
+                           region list as value, updated in place.
+        chrom (str): chromosome name.
+        start (int): region start.
+        end (int): region end.
     """
-    region_list = []
-    sorted_pos = sorted(position_set)
-    start = sorted_pos[0]
-    for pos_id in range(1, len(sorted_pos)):
-        if sorted_pos[pos_id] - sorted_pos[pos_id-1] != 1:
-            region_list.append((start, sorted_pos[pos_id-1]))
-            start = sorted_pos[pos_id]
-    region_list.append((start, sorted_pos[-1]))
-    return region_list
+    region_list = chr_region.get(chrom)
+    if region_list is None:
+        chr_region[chrom] = [(start, end)]
+    elif region_list[-1][0] <= start <= region_list[-1][1]:
+        if end > region_list[-1][1]:
+            region_list[-1] = (region_list[-1][0], end)
+    else:
+        region_list.append((start, end))
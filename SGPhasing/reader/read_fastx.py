@@ -9,21 +9,137 @@
 # have been included as part of this package.
 """SGPhasing.reader read fasta/q file.
 
+Classes:
+  - Process_Reader
+
 Functions:
+  - get_fastx_format
   - open_fastx
+  - open_gzip
   - get_seq_dict
   - check_index
+  - cached_check_index
   - faidx
+  - check_fastx_index
 """
 
+from functools import lru_cache
 import gzip
-from pathlib import Path
+from os import stat
+from shutil import which
+from subprocess import CalledProcessError, PIPE, Popen
 from sys import exit
 
 import mappy as mp
 import pysam
 
-from SGPhasing.sys_output import Output
+from SGPhasing.processor.minimap2 import build_index
+from SGPhasing.sys_file import is_up_to_date
+from SGPhasing.sys_output import output
+
+# decompress gzipped input in another process when pigz is available
+PIGZ_PATH = which('pigz')
+FASTX_SUFFIX_FORMAT_DICT = {
+    'fastq': 'fastq', 'fq': 'fastq', 'fasta': 'fasta', 'fa': 'fasta'}
+
+
+class Process_Reader(object):
+    """Binary stdout stream of a decompressing process.
+
+    Reaching EOF or closing the stream waits for the process, and raises
+    CalledProcessError when it exits nonzero, so that a truncated input
+    never passes as a short one.
+
+    Attributes:
+        args (list): process arguments list.
+        proc (Popen): running process.
+    """
+
+    def __init__(self, args: list, bufsize: int = 1 << 20) -> None:
+        """Start the process.
+
+        Args:
+            args (list): process arguments list.
+            bufsize (int): stdout buffer size, default 1 MiB.
+        """
+        self.args = args
+        self.proc = Popen(args, stdout=PIPE, bufsize=bufsize)
+
+    def __enter__(self):
+        """Enter context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Close stream on exit."""
+        self.close()
+
+    def __iter__(self):
+        """Iterate over lines."""
+        return self
+
+    def __next__(self) -> bytes:
+        """Return next line, check the process at EOF."""
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def readline(self, size: int = -1) -> bytes:
+        """Read one line, check the process at EOF."""
+        if self.closed:
+            return b''
+        line = self.proc.stdout.readline(size)
+        if not line and size:
+            self.wait()
+        return line
+
+    def read(self, size: int = -1) -> bytes:
+        """Read up to size bytes, check the process at EOF."""
+        if self.closed:
+            return b''
+        data = self.proc.stdout.read(size)
+        if size is None or size < 0 or (size and not data):
+            self.wait()
+        return data
+
+    def wait(self) -> None:
+        """Wait for the process at EOF and check its return code."""
+        self.proc.stdout.close()
+        if self.proc.wait():
+            raise CalledProcessError(self.proc.returncode, self.args)
+
+    def close(self) -> None:
+        """Close stdout, stopping the process if not read to the end."""
+        if self.proc.stdout.closed:
+            return
+        # an early close is not an error of the process
+        self.proc.kill()
+        self.proc.stdout.close()
+        self.proc.wait()
+
+    @property
+    def closed(self) -> bool:
+        """Whether stdout is closed."""
+        return self.proc.stdout.closed
+
+
+def get_fastx_format(input_fastx: str) -> tuple:
+    """Get fasta/q format from the file suffix, case insensitive.
+
+    Args:
+        input_fastx (str): input fasta/q file path string.
+
+    Returns:
+        input_format (str): input file in fasta or fastq format,
+                            None for unknown suffix.
+        is_gzip (bool): whether input is gzipped.
+    """
+    fastx_name = input_fastx.lower()
+    is_gzip = fastx_name.endswith('.gz')
+    if is_gzip:
+        fastx_name = fastx_name[:-3]
+    return (FASTX_SUFFIX_FORMAT_DICT.get(fastx_name.rsplit('.', 1)[-1]),
+            is_gzip)
 
 
 def open_fastx(input_fastx: str) -> tuple:
@@ -33,29 +149,38 @@ def open_fastx(input_fastx: str) -> tuple:
         input_fastx (str): input fasta/q file path string.
 
     Returns:
-        opened_fastx (TextIOWrapper): opened input fastx handle.
+        opened_fastx (BufferedReader): opened input fastx handle
+                                       in binary mode.
         input_format (str): input file in fasta or fastq format.
     """
-    if input_fastx.endswith(('fastq', 'fq')):
-        opened_fastx = open(input_fastx, 'r')
-        input_format = 'fastq'
-    elif input_fastx.endswith(('fastq.gz', 'fq.gz')):
-        opened_fastx = gzip.open(input_fastx, 'rb')
-        input_format = 'fastq'
-    elif input_fastx.endswith(('fasta', 'fa')):
-        opened_fastx = open(input_fastx, 'r')
-        input_format = 'fasta'
-    elif input_fastx.endswith(('fasta.gz', 'fa.gz')):
-        opened_fastx = gzip.open(input_fastx, 'rb')
-        input_format = 'fasta'
-    else:
-        output = Output()
+    input_format, is_gzip = get_fastx_format(input_fastx)
+    if input_format is None:
         output.error('Input error: input format must be '
                      'fastq, fasta, fq, fa, or gzipped file.')
         exit()
+    if is_gzip:
+        opened_fastx = open_gzip(input_fastx)
+    else:
+        opened_fastx = open(input_fastx, 'rb', buffering=1 << 20)
     return opened_fastx, input_format
 
 
+def open_gzip(input_gzip: str):
+    """Open gzipped file for binary reading, through pigz if available.
+
+    Args:
+        input_gzip (str): input gzipped file path string.
+
+    Returns:
+        opened_gzip (BufferedReader | Process_Reader): opened decompressed
+                                                       stream, raising
+                                                       on truncated input.
+    """
+    if PIGZ_PATH is None:
+        return gzip.open(input_gzip, 'rb')
+    return Process_Reader([PIGZ_PATH, '-cd', input_gzip])
+
+
 def get_seq_dict(input_fastx: str) -> dict:
     """Get sequences dict from fasta/q file.
 
@@ -65,45 +190,62 @@ def get_seq_dict(input_fastx: str) -> dict:
     Returns:
         id_seq_dict (dict): id as key and sequence as value.
     """
-    id_seq_dict = {}
-    opened_fastx, input_format = open_fastx(input_fastx)
-    seq_id, sequence, seq_line = '', '', True
-    if input_format == 'fasta':
-        identifier = '>'
-    else:
-        identifier = '@'
-    for eachline in opened_fastx:
-        if eachline[0] == identifier:
-            if seq_id:
-                id_seq_dict.update({seq_id: sequence})
-            seq_id = eachline.strip().split()[0][1:]
-            sequence = ''
-            seq_line = True
-        elif eachline[0] == '+':
-            seq_line = False
-        elif seq_line:
-            sequence += eachline.strip()
-    id_seq_dict.update({seq_id: sequence})
-    return id_seq_dict
+    return {seq_id: sequence
+            for seq_id, sequence, _ in mp.fastx_read(input_fastx)}
 
 
 def check_index(reference: str, threads: int = 1) -> None:
     """Build index for minimap2 if not exists.
 
+    Results are cached in process by file path, mtime and size.
+
     Args:
         reference (str): reference fasta file path string.
-        threads (int): threads using for mappy to index, default 1.
+        threads (int): threads using for minimap2 to index, default 1.
     """
-    index_file = reference + '.mmi'
-    index_path = Path(index_file)
-    if not index_path.exists():
-        output = Output()
-        output.info('Preparing genome index for minimap2')
-        opened_aligner = mp.Aligner(reference, preset='splice:hq',
-                                    k=17, best_n=100,
-                                    n_threads=threads, fn_idx_out=index_file)
+    reference_stat = stat(reference)
+    cached_check_index(reference, reference_stat.st_mtime_ns,
+                       reference_stat.st_size, threads)
+
+
+@lru_cache(maxsize=128)
+def cached_check_index(reference: str,
+                       mtime_ns: int,
+                       size: int,
+                       threads: int = 1) -> None:
+    """Build index for minimap2 if not exists, cached by file state.
+
+    Args:
+        reference (str): reference fasta file path string.
+        mtime_ns (int): reference modification time in nanoseconds.
+        size (int): reference size in bytes.
+        threads (int): threads using for minimap2 to index, default 1.
+    """
+    output.info('Checking genome index for minimap2')
+    build_index(reference, threads)
 
 
 def faidx(reference: str) -> None:
     """Build samtools fasta index."""
     pysam.faidx('--length', '70', reference)
+
+
+def check_fastx_index(input_fastx: str) -> bool:
+    """Build samtools fasta/q index for random access if not up to date.
+
+    Args:
+        input_fastx (str): input fasta/q file path string.
+
+    Returns:
+        is_indexed (bool): whether input has an up to date .fai index,
+                           gzipped input is never indexed.
+    """
+    input_format, is_gzip = get_fastx_format(input_fastx)
+    if is_gzip:
+        return False
+    if not is_up_to_date(input_fastx + '.fai', input_fastx):
+        if input_format == 'fastq':
+            pysam.fqidx(input_fastx)
+        else:
+            pysam.faidx(input_fastx)
+    return True
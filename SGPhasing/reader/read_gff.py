@@ -11,14 +11,15 @@
 
 Functions:
   - read_gff
-  - get_info_dict
+  - push_linked_pairs
 """
 
-from gc import collect
+from heapq import heappop, heappush
 from io import TextIOWrapper
+from sys import intern
 
-from SGPhasing.Regions import Linked_Region, Region
-from SGPhasing.Regions import check_two_linked_regions
+from SGPhasing.Regions import Linked_Region, Region, RegionIndex
+from SGPhasing.Regions import check_two_linked_regions, get_info_value
 from SGPhasing.Regions import merge_two_linked_regions
 
 
@@ -35,19 +36,20 @@ def read_gff(opened_gff: TextIOWrapper) -> dict:
     gene_id_linked_region = {}
     for eachline in opened_gff:
         if eachline[0] != '#':
-            sp = eachline.strip().split()
+            # gff3 is tab separated and only the 9th column may hold spaces
+            sp = eachline.rstrip('\n').split('\t', 8)
             if sp[2] == 'mRNA':
-                gene_id = get_info_dict(sp[8])['Parent']
+                gene_id = intern(get_info_value(sp[8], 'Parent'))
                 gene_region = Region(sp[0], int(sp[3]),
                                      int(sp[4]), sp[6], sp[8])
                 if gene_id in gene_id_linked_region:
                     gene_id_linked_region[
                         gene_id].append_secondary(gene_region)
                 else:
-                    gene_id_linked_region.update({
-                        gene_id: Linked_Region(gene_region)})
+                    gene_id_linked_region[gene_id] = Linked_Region(
+                        gene_region)
             elif sp[2] == 'exon':
-                gene_id = get_info_dict(sp[8])['Parent']
+                gene_id = intern(get_info_value(sp[8], 'Parent'))
                 exon_region = Region(sp[0], int(sp[3]),
                                      int(sp[4]), sp[6], sp[8])
                 if gene_id_linked_region[gene_id].Secondary_Regions_list:
@@ -60,43 +62,86 @@ def read_gff(opened_gff: TextIOWrapper) -> dict:
         linked_region.Primary_Region.check_child()
         for secondary_region in linked_region.Secondary_Regions_list:
             secondary_region.check_child()
-    merged_linked_region, repeat_id_set = {}, set()
+    merged_linked_region, repeat_id_set, coverage_cache = {}, set(), {}
     gene_id_list = list(gene_id_linked_region.keys())
-    genes_num = len(gene_id_list)
-    for index1, gene_id in enumerate(gene_id_list):
-        for index2 in range(index1+1, genes_num):
-            linked_region1 = gene_id_linked_region.get(gene_id_list[index1])
-            linked_region2 = gene_id_linked_region.get(gene_id_list[index2])
-            if check_two_linked_regions(linked_region1, linked_region2):
-                if index1 in repeat_id_set:
-                    merged_linked_region.update({
-                        gene_id_list[index2]: merge_two_linked_regions(
-                            linked_region2, linked_region1)})
-                else:
-                    merged_linked_region.update({
-                        gene_id: merge_two_linked_regions(
-                            linked_region1, linked_region2)})
-                    repeat_id_set.add(index2)
-    for id in repeat_id_set:
-        del gene_id_linked_region[gene_id_list[id]]
+    primary_regions_list = [
+        gene_id_linked_region[gene_id].Primary_Region
+        for gene_id in gene_id_list]
+    primary_region_index = RegionIndex(primary_regions_list)
+    primary_gene_index_dict = {
+        id(primary_region): gene_index
+        for gene_index, primary_region in enumerate(primary_regions_list)}
+    pairs_heap, seen_pairs_set = [], set()
+    for gene_index, gene_id in enumerate(gene_id_list):
+        push_linked_pairs(
+            gene_index, gene_id_linked_region[gene_id].Secondary_Regions_list,
+            primary_region_index, primary_gene_index_dict,
+            pairs_heap, seen_pairs_set)
+    # pairs are popped in the same order as a full nested loop over indexes
+    while pairs_heap:
+        index1, index2 = heappop(pairs_heap)
+        gene_id = gene_id_list[index1]
+        linked_region1 = gene_id_linked_region.get(gene_id)
+        linked_region2 = gene_id_linked_region.get(gene_id_list[index2])
+        if check_two_linked_regions(linked_region1, linked_region2,
+                                    coverage_cache=coverage_cache):
+            if index1 in repeat_id_set:
+                merged_index, merged_region = index2, linked_region2
+                secondary_num = len(linked_region2.Secondary_Regions_list)
+                merged_linked_region[gene_id_list[index2]] = (
+                    merge_two_linked_regions(
+                        linked_region2, linked_region1,
+                        coverage_cache=coverage_cache))
+            else:
+                merged_index, merged_region = index1, linked_region1
+                secondary_num = len(linked_region1.Secondary_Regions_list)
+                merged_linked_region[gene_id] = merge_two_linked_regions(
+                    linked_region1, linked_region2,
+                    coverage_cache=coverage_cache)
+                repeat_id_set.add(index2)
+            # merging appends secondary regions which may link later pairs
+            push_linked_pairs(
+                merged_index,
+                merged_region.Secondary_Regions_list[secondary_num:],
+                primary_region_index, primary_gene_index_dict,
+                pairs_heap, seen_pairs_set, (index1, index2))
+    for repeat_id in repeat_id_set:
+        del gene_id_linked_region[gene_id_list[repeat_id]]
     gene_id_linked_region.update(merged_linked_region)
     del merged_linked_region
-    collect()
     return gene_id_linked_region
 
 
-def get_info_dict(anno_info: str) -> dict:
-    """Get information from gff3 9th column.
+def push_linked_pairs(gene_index: int,
+                      secondary_regions_list: list,
+                      primary_region_index: RegionIndex,
+                      primary_gene_index_dict: dict,
+                      pairs_heap: list,
+                      seen_pairs_set: set,
+                      last_pair: tuple = (-1, -1)) -> None:
+    """Push gene index pairs which may pass check_two_linked_regions.
 
-    Args:
-        anno_info (str): gff3 9th column string.
+    Two linked regions can only be linked when the primary region of one
+    overlaps a secondary region of the other.
 
-    Returns:
-        info_dict (dict): gff3 9th column information dictionary.
+    Args:
+        gene_index (int): index of gene owning the secondary regions.
+        secondary_regions_list (list): secondary regions in list.
+        primary_region_index (RegionIndex): index of all primary regions.
+        primary_gene_index_dict (dict): primary region object id as key
+                                        and gene index as value.
+        pairs_heap (list): heap of (index1, index2) pairs to check.
+        seen_pairs_set (set): pairs ever pushed into heap.
+        last_pair (tuple): only pairs after it are pushed, default (-1, -1).
     """
-    info_dict = {}
-    info_sp = anno_info.split(';')
-    for each_info in info_sp:
-        each_info_sp = each_info.split('=')
-        info_dict.update({each_info_sp[0]: each_info_sp[1]})
-    return info_dict
+    for secondary_region in secondary_regions_list:
+        for primary_region in primary_region_index.query(
+                secondary_region.chrom, secondary_region.strand,
+                secondary_region.start, secondary_region.end):
+            other_index = primary_gene_index_dict[id(primary_region)]
+            if other_index == gene_index:
+                continue
+            pair = (min(gene_index, other_index), max(gene_index, other_index))
+            if pair > last_pair and pair not in seen_pairs_set:
+                seen_pairs_set.add(pair)
+                heappush(pairs_heap, pair)
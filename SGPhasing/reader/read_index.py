@@ -21,6 +21,9 @@ import numpy as np
 
 from SGPhasing.writer.write_fastx import write_fasta
 
+# ascii code for each base int written by write_index.seq_to_array
+INT_BASE_ARRAY = np.frombuffer(b'ACGTMRWSYKVHDBN', dtype=np.uint8)
+
 
 def read_index(input_index: str, tmp_floder_path: Path) -> tuple:
     """Read hdf5 index file.
@@ -37,30 +40,31 @@ def read_index(input_index: str, tmp_floder_path: Path) -> tuple:
                                          as value in list.
     """
     link_id_list, positions_list_list, region_id_main_dict_list = [], [], []
-    opened_index = File(input_index, 'r')
-    for link_id in opened_index.keys():
+    opened_index = File(input_index, 'r', rdcc_nbytes=64 * 1024 * 1024)
+    for link_id, link_group in opened_index.items():
         link_floder_path = tmp_floder_path / link_id
         link_fasta_path = (
             link_floder_path / 'expanded_primary.reference.fasta')
         if not link_floder_path.is_dir():
             link_floder_path.mkdir()
         region_id_main_dict = {}
-        for region_id in opened_index[link_id].keys():
+        for region_id, region_item in link_group.items():
             if region_id == 'reference':
                 if not link_fasta_path.exists():
                     opened_link_fasta = link_fasta_path.open('w')
-                    sequence = array_to_seq(
-                        np.array(opened_index[link_id][region_id]))
+                    sequence = array_to_seq(region_item[()])
                     write_fasta(opened_link_fasta, link_id, sequence)
                     opened_link_fasta.close()
             elif region_id == 'positions':
-                positions_list = np.array(opened_index[link_id][region_id])
+                positions_list = region_item[()]
             else:
-                region_id_main_dict.update({region_id: [
-                    opened_index[link_id][region_id].attrs['chromosome'],
-                    opened_index[link_id][region_id].attrs['start'],
-                    opened_index[link_id][region_id].attrs['end'],
-                    np.array(opened_index[link_id][region_id]['index'])]})
+                # read all attributes of region group in one pass
+                region_attrs_dict = dict(region_item.attrs)
+                region_id_main_dict[region_id] = [
+                    region_attrs_dict['chromosome'],
+                    region_attrs_dict['start'],
+                    region_attrs_dict['end'],
+                    region_item['index'][()]]
         link_id_list.append(link_id)
         positions_list_list.append(positions_list)
         region_id_main_dict_list.append(region_id_main_dict)
@@ -77,6 +81,4 @@ def array_to_seq(array: np.ndarray) -> str:
     Returns:
         (str): sequence string.
     """
-    INT_BASE = ['A', 'C', 'G', 'T', 'M', 'R', 'W', 'S',
-                'Y', 'K', 'V', 'H', 'D', 'B', 'N']
-    return ''.join([INT_BASE[index] for index in array])
+    return INT_BASE_ARRAY[np.asarray(array, dtype=np.intp)].tobytes().decode()
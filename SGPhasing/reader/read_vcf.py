@@ -22,7 +22,7 @@ def get_alt_positions(input_vcf: str, ploidy: int) -> list:
         ploidy (int): ploidy number.
 
     Returns:
-        positions_list (list): position list for each base.
+        positions_list (list): sorted position list for each base.
     """
     min_freq = 0.5 / ploidy
     max_freq = 1 - min_freq
@@ -30,15 +30,20 @@ def get_alt_positions(input_vcf: str, ploidy: int) -> list:
     with open(input_vcf, 'r') as opened_vcf:
         for eachline in opened_vcf:
             if eachline[0] != '#':
-                sp = eachline.strip().split()
-                alt_sp = sp[4].split(',')
-                if any([len(alt) == 1 for alt in alt_sp]):
-                    merge_sp = sp[9].split(':')
+                # single sample vcf, nothing after the 10th column is needed
+                sp = eachline.rstrip('\n').split('\t', 10)
+                if any(len(alt) == 1 for alt in sp[4].split(',')):
+                    merge_sp = sp[9].split(':', 3)
                     dp = int(merge_sp[2])
-                    if all([min_freq < int(ph_dp) / dp < max_freq
-                            for ph_dp in merge_sp[1].split(',')[1:]]):
+                    alt_dp_list = [
+                        int(ph_dp) for ph_dp in merge_sp[1].split(',')[1:]]
+                    # bound only the rarest and commonest alt, no division
+                    if not alt_dp_list or (
+                            min_freq * dp < min(alt_dp_list) and
+                            max(alt_dp_list) < max_freq * dp):
                         if len(sp[3]) == 1:
                             positions_list.append(int(sp[1])-1)
                         else:
                             positions_list.append(int(sp[1]))
-    return positions_list
+    # index prototypes are stored in sorted position order
+    return sorted(positions_list)
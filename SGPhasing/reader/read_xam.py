@@ -11,72 +11,153 @@
 
 Functions:
   - open_xam
+  - fetch_regions
   - check_index
+  - cached_check_index
   - extract_read_matrix
+  - pileup_ranges
+  - group_positions
   - remove_blank
   - check_flag
   - read_to_fastq
 """
 
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from os import stat
 from sys import exit
 
+import numpy as np
 import pysam
 
-from SGPhasing.sys_output import Output
+from SGPhasing.sys_output import output
 
+# bases matrix encoding, IUPAC bases follow write_index.seq_to_array
+BASES_STR = 'ACGTMRWSYKVHDBN-'
+GAP_INT = BASES_STR.index('-')
+BLANK_INT = len(BASES_STR)
+BASE_INT_ARRAY = np.full(256, BASES_STR.index('N'), dtype=np.uint8)
+BASE_INT_ARRAY[np.frombuffer(BASES_STR.encode(), np.uint8)] = np.arange(
+    len(BASES_STR))
+BASE_INT_ARRAY[np.frombuffer(BASES_STR.lower().encode(), np.uint8)] = (
+    np.arange(len(BASES_STR)))
+# pileup query sequences mark deletions by '*' and reference skips by '<>',
+# both are gaps as pileupread.is_del is true for reference skips too
+PILEUP_INT_ARRAY = BASE_INT_ARRAY.copy()
+PILEUP_INT_ARRAY[[ord('*'), ord('<'), ord('>')]] = GAP_INT
+# bai can not index contigs of 2^29 bp or longer, use csi for them
+BAI_MAX_LENGTH = 1 << 29
+# htslib SAM_QNAME | SAM_FLAG | SAM_RNAME | SAM_POS | SAM_CIGAR,
+# enough for read names, flags and region fetch
+NAME_FLAG_FIELDS = 0x1 | 0x2 | 0x4 | 0x8 | 0x20
 
-def open_xam(input_xam: str) -> tuple:
+
+def open_xam(input_xam: str,
+             threads: int = 1,
+             required_fields: int = 0) -> pysam.AlignmentFile:
     """Check input and open.
 
     Args:
         input_xam (str): input sam or bam file path string.
+        threads (int): threads using for htslib decompression, default 1.
+        required_fields (int): htslib SAM_* fields bitmask cram decoding
+                               is limited to, default 0 for all fields.
 
     Returns:
         xamfile (AlignmentFile): pysam opened bam/cram/sam file handle.
-        input_format (str): return input_xam format, sam or bam.
     """
     if input_xam.endswith('cram'):
-        xamfile = pysam.AlignmentFile(input_xam, 'rc', check_sq=False)
-        input_format = 'cram'
+        format_options = (
+            [f'required_fields={required_fields:#x}']
+            if required_fields else None)
+        xamfile = pysam.AlignmentFile(
+            input_xam, 'rc', check_sq=False, threads=threads,
+            format_options=format_options)
     elif input_xam.endswith('bam'):
-        xamfile = pysam.AlignmentFile(input_xam, 'rb', check_sq=False)
-        input_format = 'bam'
+        xamfile = pysam.AlignmentFile(
+            input_xam, 'rb', check_sq=False, threads=threads)
     elif input_xam.endswith('sam'):
-        xamfile = pysam.AlignmentFile(input_xam, 'r', check_sq=False)
-        input_format = 'sam'
+        xamfile = pysam.AlignmentFile(
+            input_xam, 'r', check_sq=False, threads=threads)
     else:
-        output = Output()
         output.error('Input error: input format must be'
                      ' bam, cram or sam file.')
         exit()
-    return xamfile, input_format
+    return xamfile
+
+
+def fetch_regions(opened_xam: pysam.AlignmentFile,
+                  limit_region_dict: dict):
+    """Fetch reads in all limit regions in one pass.
+
+    Chromosomes are visited in the order of the file header, so the
+    index seeks only move forward through the file.
+
+    Args:
+        opened_xam (AlignmentFile): pysam opened bam/cram/sam file handle.
+        limit_region_dict (dict): chrom as key and merged region list
+                                  as value.
+
+    Yields:
+        read (AlignedSegment): read in pysam.AlignedSegment type.
+    """
+    for chrom in sorted(limit_region_dict, key=opened_xam.get_tid):
+        for start, end in limit_region_dict[chrom]:
+            yield from opened_xam.fetch(chrom, start, end)
 
 
 def check_index(input_xam: str, threads: int = 1) -> str:
     """Build index for bam if not exists.
 
+    Results are cached in process by file path, mtime and size.
+
     Args:
         input_xam (str): input sam or bam file path string.
         threads (int): threads using for pysam sort and index, default 1.
+
+    Returns:
+        (str): indexed bam/cram file path string.
     """
-    xamfile, input_format = open_xam(input_xam)
+    input_stat = stat(input_xam)
+    return cached_check_index(
+        input_xam, input_stat.st_mtime_ns, input_stat.st_size, threads)
+
+
+@lru_cache(maxsize=128)
+def cached_check_index(input_xam: str,
+                       mtime_ns: int,
+                       size: int,
+                       threads: int = 1) -> str:
+    """Build index for bam if not exists, cached by file state.
+
+    Args:
+        input_xam (str): input sam or bam file path string.
+        mtime_ns (int): input file modification time in nanoseconds.
+        size (int): input file size in bytes.
+        threads (int): threads using for pysam sort and index, default 1.
+
+    Returns:
+        (str): indexed bam/cram file path string.
+    """
+    xamfile = open_xam(input_xam)
+    index_format = (
+        '-c' if max(xamfile.lengths, default=0) >= BAI_MAX_LENGTH else '-b')
     try:
         xamfile.check_index()
+        xamfile.close()
         return input_xam
     except ValueError:
-        output = Output()
         output.info(f'Preparing samtools index for input {input_xam}')
-        pysam.index(input_xam, '-b', '-m', '17', '-@', str(threads))
+        pysam.index(input_xam, index_format, '-@', str(threads))
         xamfile.close()
         return input_xam
     except AttributeError:
-        output = Output()
         output.info(f'Preparing samtools index for input {input_xam}')
-        if input_format == 'sam':
+        if input_xam.endswith('sam'):
             input_bam = input_xam[:-3] + 'bam'
             pysam.sort('-o', input_bam, '--output-fmt', 'BAM',
                        '--threads', str(threads), input_xam)
-            pysam.index(input_bam, '-b', '-m', '17', '-@', str(threads))
+            pysam.index(input_bam, index_format, '-@', str(threads))
             xamfile.close()
             return input_bam
         else:
@@ -85,59 +166,129 @@ def check_index(input_xam: str, threads: int = 1) -> str:
             exit()
 
 
-def extract_read_matrix(input_bam: str, positions_list: list) -> tuple:
+def extract_read_matrix(input_bam: str,
+                        positions_list: list,
+                        threads: int = 1) -> tuple:
     """Extract reads base matrix.
 
     Args:
         input_bam (str): input bam file path string.
-        positions_list (list): position list for each base.
+        positions_list (list): sorted position list, one for each column.
+        threads (int): threads decompressing bam and piling up
+                       position ranges, default 1.
 
     Returns:
         reads_id_list (list): extracted read_id list for each read.
-        read_base_matrix (list): extracted bases matrix for each read.
+        read_base_matrix (ndarray): extracted bases matrix for each read,
+                                    encoded in uint8 by BASES_STR and
+                                    BLANK_INT for uncovered bases.
     """
-    reads_bases_matrix, reads_id_list = [], []
-    opened_bam = pysam.AlignmentFile(input_bam, 'rb')
-    bases_num = len(positions_list)
-    for read_index, read in enumerate(opened_bam.fetch()):
+    reads_id_list, read_index_dict = [], {}
+    # htslib decompression threads speed up the whole file read id pass
+    opened_bam = pysam.AlignmentFile(input_bam, 'rb', threads=threads)
+    pos_base_id_dict = {
+        pos: base_id for base_id, pos in enumerate(positions_list)}
+    for read in opened_bam.fetch():
         read_id = read.query_name
+        read_index_dict.setdefault(read_id, len(reads_id_list))
         reads_id_list.append(read_id)
-        reads_bases_matrix.append(['' for base_id in range(bases_num)])
-    base_id = 0
-    for pileupcolumn in opened_bam.pileup():
-        if pileupcolumn.pos in positions_list:
-            for pileupread in pileupcolumn.pileups:
-                read_index = reads_id_list.index(
-                    pileupread.alignment.query_name)
-                if pileupread.is_del:
-                    reads_bases_matrix[read_index][base_id] = '-'
-                else:
-                    reads_bases_matrix[read_index][base_id] = (
-                        pileupread.alignment.query_sequence[
-                            pileupread.query_position])
-            base_id += 1
+    reads_bases_matrix = np.full((len(reads_id_list), len(positions_list)),
+                                 BLANK_INT, dtype=np.uint8)
+    # expanded reference holds a single contig, only pile up SNP clusters
+    ranges_list = group_positions(positions_list)
+    workers_num = min(threads, len(ranges_list))
+    if workers_num > 1:
+        # ranges fill disjoint columns, each extra thread opens one handle
+        opened_bam_list = [opened_bam] + [
+            pysam.AlignmentFile(input_bam, 'rb')
+            for _ in range(workers_num - 1)]
+        with ThreadPoolExecutor(max_workers=workers_num) as executor:
+            for future in [executor.submit(
+                    pileup_ranges, opened_bam_list[worker_id],
+                    ranges_list[worker_id::workers_num], pos_base_id_dict,
+                    read_index_dict, reads_bases_matrix)
+                    for worker_id in range(workers_num)]:
+                future.result()
+        for extra_opened_bam in opened_bam_list[1:]:
+            extra_opened_bam.close()
+    else:
+        pileup_ranges(opened_bam, ranges_list, pos_base_id_dict,
+                      read_index_dict, reads_bases_matrix)
     opened_bam.close()
     return reads_id_list, reads_bases_matrix
 
 
-def remove_blank(reads_id_list: list, reads_bases_matrix: list) -> tuple:
+def pileup_ranges(opened_bam: pysam.AlignmentFile,
+                  ranges_list: list,
+                  pos_base_id_dict: dict,
+                  read_index_dict: dict,
+                  reads_bases_matrix: np.ndarray) -> None:
+    """Pile up ranges of first contig into reads bases matrix.
+
+    Args:
+        opened_bam (AlignmentFile): opened input bam handle.
+        ranges_list (list): (start, end) half-open range in list.
+        pos_base_id_dict (dict): position as key and column as value.
+        read_index_dict (dict): read id as key and row as value.
+        reads_bases_matrix (ndarray): bases matrix filled in place.
+    """
+    for start, end in ranges_list:
+        for pileupcolumn in opened_bam.pileup(
+                opened_bam.references[0], start, end, truncate=True):
+            base_id = pos_base_id_dict.get(pileupcolumn.reference_pos)
+            if base_id is None:
+                continue
+            # first char is the base, '*' for deletion or '<>' for skip
+            query_bases = ''.join([
+                query_sequence[:1] or '*' for query_sequence in
+                pileupcolumn.get_query_sequences(add_indels=True)])
+            reads_bases_matrix[
+                [read_index_dict[read_id]
+                 for read_id in pileupcolumn.get_query_names()],
+                base_id] = PILEUP_INT_ARRAY[
+                    np.frombuffer(query_bases.encode(), np.uint8)]
+
+
+def group_positions(sorted_positions: list, max_gap: int = 500) -> list:
+    """Group sorted positions into half-open ranges for pileup.
+
+    Positions closer than max_gap share one range, so reads spanning
+    nearby SNPs are decoded once, while long gaps are skipped.
+
+    Args:
+        sorted_positions (list): sorted 0-based positions.
+        max_gap (int): max gap between positions in one range, default 500.
+
+    Returns:
+        ranges_list (list): (start, end) half-open range in list.
+    """
+    ranges_list = []
+    for position in sorted_positions:
+        if ranges_list and position - ranges_list[-1][1] < max_gap:
+            ranges_list[-1][1] = position + 1
+        else:
+            ranges_list.append([position, position + 1])
+    return [(start, end) for start, end in ranges_list]
+
+
+def remove_blank(reads_id_list: list,
+                 reads_bases_matrix: np.ndarray) -> tuple:
     """Remove blank reads from reads_bases_matrix.
 
     Args:
         reads_id_list (list): extracted read_id list for each read.
-        read_base_matrix (list): extracted bases matrix for each read.
+        read_base_matrix (ndarray): extracted bases matrix for each read.
 
     Returns:
         new_reads_id_list (list): blank-removed read_id list for each read.
-        new_reads_bases_matrix (list): blank-removed bases matrix
-                                       for each read.
+        new_reads_bases_matrix (ndarray): blank-removed bases matrix
+                                          for each read.
     """
-    new_reads_id_list, new_reads_bases_matrix = [], []
-    for read_id, read_bases_matrix in zip(reads_id_list, reads_bases_matrix):
-        if not all([base == '' for base in read_bases_matrix]):
-            new_reads_id_list.append(read_id)
-            new_reads_bases_matrix.append(read_bases_matrix)
-    return new_reads_id_list, new_reads_bases_matrix
+    read_index_array = np.flatnonzero(
+        (reads_bases_matrix != BLANK_INT).any(axis=1))
+    new_reads_id_list = [
+        reads_id_list[read_index] for read_index in read_index_array]
+    return new_reads_id_list, reads_bases_matrix[read_index_array]
 
 
 def check_flag(read: pysam.AlignedSegment, flag: int) -> bool:
@@ -150,16 +301,7 @@ def check_flag(read: pysam.AlignedSegment, flag: int) -> bool:
     Returns:
         has_flag (bool): read has the flag or not.
     """
-    if read.flag < flag:
-        return False
-    else:
-        flag_bin, read_bin = bin(flag), bin(read.flag)
-        for bin_id in range(1, len(flag_bin)-1):
-            if flag_bin[-bin_id] == 1:
-                if read_bin[-bin_id] != 1:
-                    return False
-        else:
-            return True
+    return read.flag & flag == flag
 
 
 def read_to_fastq(read: pysam.AlignedSegment) -> str:
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Shang Xie.
+# All rights reserved.
+#
+# This file is part of the SGPhasing distribution and
+# governed by your choice of the "SGPhasing License Agreement"
+# or the "GNU General Public License v3.0".
+# Please see the LICENSE file that should
+# have been included as part of this package.
+"""SGPhasing check intermediate files.
+
+Functions:
+  - is_up_to_date
+  - atomic_output
+"""
+
+from contextlib import contextmanager
+from os import environ, replace, stat
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+ARGS_SUFFIX = '.args'
+
+
+def is_up_to_date(output_path: str,
+                  *input_paths: str,
+                  args: list = None) -> bool:
+    """Check output file exists and is newer than all input files.
+
+    Setting SGPHASING_FORCE=1 in the environment disables reusing.
+
+    Args:
+        output_path (str): output file path string.
+        input_paths (str): input file path strings.
+        args (list): arguments the output was built with, compared with
+                     the ones recorded by atomic_output, default None
+                     for not comparing.
+
+    Returns:
+        (bool): output is up to date and can be reused.
+    """
+    if environ.get('SGPHASING_FORCE') == '1':
+        return False
+    try:
+        output_mtime = stat(output_path).st_mtime_ns
+    except FileNotFoundError:
+        return False
+    if not all(stat(input_path).st_mtime_ns < output_mtime
+               for input_path in input_paths):
+        return False
+    if args is None:
+        return True
+    args_path = Path(output_path + ARGS_SUFFIX)
+    return (args_path.is_file() and
+            args_path.read_text() == ''.join(f'{arg}\n' for arg in args))
+
+
+@contextmanager
+def atomic_output(output_path: str, args: list = None):
+    """Yield a temporary output path, moved into place on success.
+
+    The temporary path lives in a fresh directory next to the output,
+    every file written there, such as an index, is moved beside the
+    output and the output itself last, so that a failed or killed run
+    never leaves a partial output newer than its inputs.
+
+    Args:
+        output_path (str): output file path string.
+        args (list): arguments the output is built with, recorded for
+                     is_up_to_date, default None for not recording.
+
+    Yields:
+        tmp_output_path (str): temporary output file path string.
+    """
+    output_path = Path(output_path)
+    args_path = Path(f'{output_path}{ARGS_SUFFIX}')
+    with TemporaryDirectory(dir=output_path.parent) as tmp_dir:
+        tmp_output_path = Path(tmp_dir) / output_path.name
+        yield str(tmp_output_path)
+        for each_path in Path(tmp_dir).iterdir():
+            if each_path != tmp_output_path:
+                replace(each_path, output_path.parent / each_path.name)
+        if args_path.is_file():
+            args_path.unlink()
+        replace(tmp_output_path, output_path)
+    if args is not None:
+        args_path.write_text(''.join(f'{arg}\n' for arg in args))
@@ -16,10 +16,25 @@ Format and display output.
 
 Classes:
   - Output
+
+Redirect output into a file.
+----------------------------
+
+Functions:
+  - redirect_output
 """
 
+from contextlib import contextmanager
+from io import TextIOWrapper
+import os
+import sys
+
 from rich import print as rprint
 
+INFO_PREFIX = ':information_source: [bright_green]INFO[/bright_green]    '
+WARNING_PREFIX = ':warning: [bright_yellow]WARNING[/bright_yellow] '
+ERROR_PREFIX = ':no_entry: [bright_red]ERROR[/bright_red]   '
+
 
 class Output(object):
     """Format and display output."""
@@ -43,18 +58,45 @@ class Output(object):
     def info(self, text: str) -> None:
         """Format INFO text."""
         if text:
-            trm = (':information_source: ' +
-                   '[bright_green]INFO[/bright_green]    ')
-            rprint(trm + self.__indent_text_block(text))
+            rprint(INFO_PREFIX + self.__indent_text_block(text))
 
     def warning(self, text: str) -> None:
         """Format WARNING text."""
         if text:
-            trm = ':warning: [bright_yellow]WARNING[/bright_yellow] '
-            rprint(trm + self.__indent_text_block(text))
+            rprint(WARNING_PREFIX + self.__indent_text_block(text))
 
     def error(self, text: str) -> None:
         """Format ERROR text."""
         if text:
-            trm = ':no_entry: [bright_red]ERROR[/bright_red]   '
-            rprint(trm + self.__indent_text_block(text))
+            rprint(ERROR_PREFIX + self.__indent_text_block(text))
+
+
+# shared instance for module level functions
+output = Output()
+
+
+@contextmanager
+def redirect_output(opened_file: TextIOWrapper):
+    """Redirect stdout and stderr file descriptors into an opened file.
+
+    Unlike reassigning sys.stdout, this also captures output written
+    by C extensions and child processes.
+
+    Args:
+        opened_file (TextIOWrapper): opened output file handle.
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    opened_file.flush()
+    saved_stdout_fd, saved_stderr_fd = os.dup(1), os.dup(2)
+    os.dup2(opened_file.fileno(), 1)
+    os.dup2(opened_file.fileno(), 2)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(saved_stdout_fd, 1)
+        os.dup2(saved_stderr_fd, 2)
+        os.close(saved_stdout_fd)
+        os.close(saved_stderr_fd)
@@ -20,15 +20,41 @@ Functions:
 
 import numpy as np
 
-
-def thread_haplotypes(ref_reads_bases_matrix: list,
-                      index_reads_bases_matrix: list,
+from SGPhasing.reader.read_xam import BASES_STR, BLANK_INT
+
+ONE_HOT_BASES = np.array(['A', 'C', 'G', 'T', '-'])
+ONE_HOT = {
+    '-': [0., 0., 0., 0., 1.],
+    'A': [1., 0., 0., 0., 0.],
+    'C': [0., 1., 0., 0., 0.],
+    'G': [0., 0., 1., 0., 0.],
+    'T': [0., 0., 0., 1., 0.],
+    'M': [0.5, 0.5, 0., 0., 0.],
+    'R': [0.5, 0., 0.5, 0., 0.],
+    'W': [0.5, 0., 0., 0.5, 0.],
+    'S': [0., 0.5, 0.5, 0., 0.],
+    'Y': [0., 0.5, 0., 0.5, 0.],
+    'K': [0., 0., 0.5, 0.5, 0.],
+    'V': [1/3, 1/3, 1/3, 0., 0.],
+    'H': [1/3, 1/3, 0., 1/3, 0.],
+    'D': [1/3, 0., 1/3, 1/3, 0.],
+    'B': [0., 1/3, 1/3, 1/3, 0.],
+    'N': [0.25, 0.25, 0.25, 0.25, 0.]}
+# one-hot row for each base int, BLANK_INT pads with zeros
+ONE_HOT_INT_ARRAY = np.zeros((BLANK_INT + 1, 5), dtype=np.float32)
+for base_int, base in enumerate(BASES_STR):
+    ONE_HOT_INT_ARRAY[base_int] = ONE_HOT[base]
+
+
+def thread_haplotypes(ref_reads_bases_matrix: np.ndarray,
+                      index_reads_bases_matrix: np.ndarray,
                       bases_num: int) -> tuple:
     """Threads haplotypes through the clusters.
 
     Args:
-        ref_reads_bases_matrix (list): reference bases matrix for each read.
-        index_reads_bases_matrix (list): index bases matrix for each read.
+        ref_reads_bases_matrix (ndarray): reference bases matrix
+                                          for each read.
+        index_reads_bases_matrix (ndarray): index bases matrix for each read.
 
     Returns:
         clusters_indexes_array (list): [indexes, array] list for each cluster.
@@ -50,56 +76,40 @@ def thread_haplotypes(ref_reads_bases_matrix: list,
             index_reads_bases_indexes)
         new_prototypes_array = update_prototype(
             clusters_indexes_array, prototypes_array, bases_num)
-        if_converge = np.all(
-            np.array(new_prototypes_array) == np.array(prototypes_array))
-        prototypes_array = new_prototypes_array[::]
+        if_converge = all(
+            np.array_equal(new_prototype_array, prototype_array)
+            for new_prototype_array, prototype_array in zip(
+                new_prototypes_array, prototypes_array))
+        prototypes_array = new_prototypes_array
     return clusters_indexes_array, sample_cluster_indexes, new_prototypes_array
 
 
-def onehot_encoder(reads_bases_matrix: list, padding: bool = False) -> tuple:
+def onehot_encoder(reads_bases_matrix: np.ndarray,
+                   padding: bool = False) -> tuple:
     """Convert reads bases matrix to one-hot array.
 
     Args:
-        reads_bases_matrix (list): bases matrix for each read.
+        reads_bases_matrix (ndarray): bases matrix for each read.
         padding (pool): if padding null value bases, default False.
 
     Returns:
-        reads_bases_indexes (list): bases index for each read.
+        reads_bases_indexes (list): bases index array for each read.
         reads_bases_array (list): bases numpy array for each read.
     """
-    ONE_HOT = {
-        '-': [0., 0., 0., 0., 1.],
-        'A': [1., 0., 0., 0., 0.],
-        'C': [0., 1., 0., 0., 0.],
-        'G': [0., 0., 1., 0., 0.],
-        'T': [0., 0., 0., 1., 0.],
-        'M': [0.5, 0.5, 0., 0., 0.],
-        'R': [0.5, 0., 0.5, 0., 0.],
-        'W': [0.5, 0., 0., 0.5, 0.],
-        'S': [0., 0.5, 0.5, 0., 0.],
-        'Y': [0., 0.5, 0., 0.5, 0.],
-        'K': [0., 0., 0.5, 0.5, 0.],
-        'V': [1/3, 1/3, 1/3, 0., 0.],
-        'H': [1/3, 1/3, 0., 1/3, 0.],
-        'D': [1/3, 0., 1/3, 1/3, 0.],
-        'B': [0., 1/3, 1/3, 1/3, 0.],
-        'N': [0.25, 0.25, 0.25, 0.25, 0.]}
     reads_bases_indexes, reads_bases_array = [], []
     for read_bases_matrix in reads_bases_matrix:
-        base_indexes, base_array = [], []
-        for base_id, base in enumerate(read_bases_matrix):
-            if base:
-                base_indexes.append(base_id)
-                base_array.append(ONE_HOT[base])
-            elif padding:
-                base_indexes.append(base_id)
-                base_array.append([0., 0., 0., 0., 0.])
+        if padding:
+            base_indexes = np.arange(len(read_bases_matrix))
+        else:
+            base_indexes = np.flatnonzero(read_bases_matrix != BLANK_INT)
         reads_bases_indexes.append(base_indexes)
-        reads_bases_array.append(np.array(base_array, dtype=np.float16))
+        reads_bases_array.append(
+            ONE_HOT_INT_ARRAY[read_bases_matrix[base_indexes]])
     return reads_bases_indexes, reads_bases_array
 
 
-def onehot_decoder(prototypes_array: list, if_base: bool = True) -> list:
+def onehot_decoder(prototypes_array: list,
+                   if_base: bool = True) -> np.ndarray:
     """Convert one-hot array to prototypes bases matrix.
 
     Args:
@@ -107,24 +117,13 @@ def onehot_decoder(prototypes_array: list, if_base: bool = True) -> list:
         if_base (bool): if return bases matrix or indexes matrix, default True.
 
     Returns:
-        prototypes_bases_matrix (list): bases matrix for each cluster.
+        prototypes_bases_matrix (ndarray): bases matrix for each cluster.
     """
-    ONE_HOT = {
-        0: 'A',
-        1: 'C',
-        2: 'G',
-        3: 'T',
-        4: '-'}
-    prototypes_bases_matrix = []
-    for prototype_array in prototypes_array:
-        if if_base:
-            prototypes_bases_matrix.append([
-                ONE_HOT[np.argmax(base_array)]
-                for base_array in prototype_array])
-        else:
-            prototypes_bases_matrix.append([
-                np.argmax(base_array) for base_array in prototype_array])
-    return prototypes_bases_matrix
+    prototypes_indexes_matrix = np.argmax(
+        np.asarray(prototypes_array), axis=-1).astype(np.uint8)
+    if if_base:
+        return ONE_HOT_BASES[prototypes_indexes_matrix]
+    return prototypes_indexes_matrix
 
 
 def distance_cluster(prototypes_array: list,
@@ -141,14 +140,27 @@ def distance_cluster(prototypes_array: list,
         clusters_indexes_array (list): [indexes, array] list for each cluster.
         sample_cluster_indexes (list): cluster index for each sample.
     """
-    clusters_indexes_array = [[[], []] for _ in range(len(prototypes_array))]
-    sample_cluster_indexes = []
-    for sample_indexes, sample_array in zip(samples_indexes, samples_array):
-        distance_list = [
-            np.linalg.norm(sample_array - prototype_array[sample_indexes])
-            for prototype_array in prototypes_array]
-        min_distance_index = np.argmin(distance_list)
-        sample_cluster_indexes.append(min_distance_index)
+    # pad samples to (samples, bases, 5) with a coverage mask, so that
+    # |x - p|^2 over covered bases = |x|^2 - 2 x.p + mask.|p|^2 in one GEMM
+    prototypes_stack = np.asarray(prototypes_array, dtype=np.float64)
+    clusters_num, bases_num = prototypes_stack.shape[:2]
+    samples_num = len(samples_array)
+    samples_stack = np.zeros((samples_num, bases_num, 5))
+    samples_mask = np.zeros((samples_num, bases_num))
+    for sample_id, (sample_indexes, sample_array) in enumerate(
+            zip(samples_indexes, samples_array)):
+        samples_stack[sample_id, sample_indexes] = sample_array
+        samples_mask[sample_id, sample_indexes] = 1.
+    distance_matrix = (
+        np.square(samples_stack).sum(axis=(1, 2))[:, None] -
+        2 * samples_stack.reshape(samples_num, bases_num * 5) @
+        prototypes_stack.reshape(clusters_num, bases_num * 5).T +
+        samples_mask @ np.square(prototypes_stack).sum(axis=2).T)
+    sample_cluster_indexes = distance_matrix.argmin(axis=1).tolist()
+
+    clusters_indexes_array = [[[], []] for _ in range(clusters_num)]
+    for min_distance_index, sample_indexes, sample_array in zip(
+            sample_cluster_indexes, samples_indexes, samples_array):
         clusters_indexes_array[min_distance_index][0].append(sample_indexes)
         clusters_indexes_array[min_distance_index][1].append(sample_array)
     return clusters_indexes_array, sample_cluster_indexes
@@ -167,25 +179,30 @@ def update_prototype(clusters_indexes_array: list,
     Returns:
         new_prototypes_array (list): new prototype array for each cluster.
     """
-    new_prototypes_array = []
-    for cluster_id, cluster_indexes_array in enumerate(clusters_indexes_array):
-        bases_count = [0 for _ in range(bases_num)]
-        new_prototype_array = np.zeros((bases_num, 5), dtype=np.float16)
-        clusters_indexes, cluster_array = cluster_indexes_array
-        for sample_indexes, sample_array in zip(
-                clusters_indexes, cluster_array):
-            for base_index, base_array in zip(sample_indexes, sample_array):
-                bases_count[base_index] += 1
-                new_prototype_array[base_index] += base_array
-        for base_id, base_count, base_array in zip(
-                range(bases_num), bases_count, new_prototype_array):
-            if base_count:
-                new_prototype_array[base_id] = base_array / base_count
-            else:
-                new_prototype_array[base_id] = prototypes_array[
-                    cluster_id][base_id][::]
-        new_prototypes_array.append(hardmax(new_prototype_array))
-    return new_prototypes_array
+    # offset bases index by cluster, so one bincount and one np.add.at
+    # accumulate every cluster at once
+    new_prototypes_stack = np.array(prototypes_array, dtype=np.float32)
+    clusters_num = len(new_prototypes_stack)
+    flat_indexes_list, flat_array_list = [], []
+    for cluster_id, (cluster_indexes, cluster_array) in enumerate(
+            clusters_indexes_array):
+        flat_indexes_list.extend(
+            cluster_id * bases_num + read_indexes
+            for read_indexes in cluster_indexes)
+        flat_array_list.extend(cluster_array)
+    # uncovered bases keep the old prototype
+    flat_prototypes_array = new_prototypes_stack.reshape(-1, 5)
+    if flat_indexes_list:
+        bases_index = np.concatenate(flat_indexes_list)
+        bases_count = np.bincount(
+            bases_index, minlength=clusters_num * bases_num)
+        bases_sum = np.zeros((clusters_num * bases_num, 5))
+        np.add.at(bases_sum, bases_index, np.concatenate(flat_array_list))
+        is_covered = bases_count > 0
+        flat_prototypes_array[is_covered] = (
+            bases_sum[is_covered] / bases_count[is_covered, None])
+    return list(hardmax(flat_prototypes_array).reshape(
+        new_prototypes_stack.shape))
 
 
 def hardmax(input_array: np.ndarray) -> np.ndarray:
@@ -197,7 +214,6 @@ def hardmax(input_array: np.ndarray) -> np.ndarray:
     Returns:
         (ndarray): numpy array in (m, n) shape.
     """
-    new_array = np.zeros(input_array.shape, dtype=np.float16)
-    for array_index, each_array in enumerate(input_array):
-        new_array[array_index][np.argmax(each_array)] = 1.
+    new_array = np.zeros(input_array.shape, dtype=np.float32)
+    new_array[np.arange(len(input_array)), input_array.argmax(axis=1)] = 1.
     return new_array
@@ -11,43 +11,128 @@
 
 Functions:
   - write_partial_fastx
+  - write_indexed_fastx
+  - write_tagged_fastx
   - write_fasta
 """
 
-from io import TextIOWrapper
+from io import BufferedReader, BufferedWriter, TextIOWrapper
 
 
-def write_partial_fastx(opened_input_fastx: TextIOWrapper,
-                        opened_output_fastx: TextIOWrapper,
+def write_partial_fastx(opened_input_fastx: BufferedReader,
+                        opened_output_fastx: BufferedWriter,
                         fastx_format: str,
                         limit_reads_set: set) -> None:
     """Write fastx for limit reads.
 
     Args:
-        opened_input_fastx (TextIOWrapper): opened input fastx handle.
-        opened_output_fastx (TextIOWrapper): opened output fastx handle.
+        opened_input_fastx (BufferedReader): opened input fastx handle
+                                             in binary mode.
+        opened_output_fastx (BufferedWriter): opened output fastx handle
+                                              in binary mode.
         fastx_format (str): input fasta/q file format.
         limit_reads_set (set): limited reads id set.
     """
+    limit_ids_set = frozenset(read_id.encode() for read_id in limit_reads_set)
+    buffer_list, buffer_size = [], 65536
     if fastx_format == 'fastq':
-        unit = 4
+        # quality lines may start with '@', so walk whole 4 lines records
+        for record in zip(*[opened_input_fastx] * 4):
+            if record[0].split(None, 1)[0][1:] in limit_ids_set:
+                buffer_list.extend(record)
+                if len(buffer_list) >= buffer_size:
+                    opened_output_fastx.writelines(buffer_list)
+                    buffer_list.clear()
     else:
-        unit = 2
-    read_unit = []
-    line_id, is_write = 0, False
-    for eachline in opened_input_fastx:
-        line_id += 1
-        if line_id % unit == 1:
+        # fasta records may wrap sequence lines
+        is_write = False
+        for eachline in opened_input_fastx:
+            if eachline.startswith(b'>'):
+                is_write = eachline.split(None, 1)[0][1:] in limit_ids_set
             if is_write:
-                opened_output_fastx.write(''.join(read_unit))
-            read_id = eachline.strip().split()[0][1:]
-            is_write = True if read_id in limit_reads_set else False
-            read_unit = [eachline]
-        else:
-            read_unit.append(eachline)
+                buffer_list.append(eachline)
+                if len(buffer_list) >= buffer_size:
+                    opened_output_fastx.writelines(buffer_list)
+                    buffer_list.clear()
+    opened_output_fastx.writelines(buffer_list)
     opened_output_fastx.close()
 
 
+def write_indexed_fastx(input_fastx: str,
+                        opened_output_fastx: BufferedWriter,
+                        fastx_format: str,
+                        limit_reads_set: set) -> None:
+    """Write fastx for limit reads by seeking through the .fai index.
+
+    Only the limit reads are read from input, in file order.
+
+    Args:
+        input_fastx (str): input uncompressed fasta/q file path string
+                           with samtools .fai index.
+        opened_output_fastx (BufferedWriter): opened output fastx handle
+                                              in binary mode.
+        fastx_format (str): input fasta/q file format.
+        limit_reads_set (set): limited reads id set.
+    """
+    is_fastq = fastx_format == 'fastq'
+    records_list = []
+    with open(input_fastx + '.fai', 'rb') as opened_fai:
+        for eachline in opened_fai:
+            fields = eachline.split(b'\t')
+            if fields[0].decode() in limit_reads_set:
+                records_list.append(
+                    (int(fields[2]), fields[0], int(fields[1]),
+                     int(fields[3]), int(fields[4]),
+                     int(fields[5]) if is_fastq else 0))
+    records_list.sort()
+    with open(input_fastx, 'rb') as opened_input_fastx:
+        for (offset, read_id, length,
+             line_bases, line_width, qual_offset) in records_list:
+            # sequence bytes on disk include the wrapped line endings
+            raw_length = length + (-(-length // line_bases)) * (
+                line_width - line_bases)
+            opened_input_fastx.seek(offset)
+            sequence = b''.join(opened_input_fastx.read(raw_length).split())
+            if is_fastq:
+                opened_input_fastx.seek(qual_offset)
+                quality = b''.join(
+                    opened_input_fastx.read(raw_length).split())
+                opened_output_fastx.write(
+                    b'@' + read_id + b'\n' + sequence +
+                    b'\n+\n' + quality + b'\n')
+            else:
+                opened_output_fastx.write(
+                    b'>' + read_id + b'\n' + sequence + b'\n')
+    opened_output_fastx.close()
+
+
+def write_tagged_fastx(opened_input_fastx: BufferedReader,
+                       opened_output_fastx: BufferedWriter,
+                       fastx_format: str,
+                       tag: str) -> None:
+    """Append fastx with 'tag:' prefixed to every read id.
+
+    Args:
+        opened_input_fastx (BufferedReader): opened input fastx handle
+                                             in binary mode.
+        opened_output_fastx (BufferedWriter): opened output fastx handle
+                                              in binary mode, kept open.
+        fastx_format (str): input fasta/q file format.
+        tag (str): read id prefix without colon.
+    """
+    is_fastq = fastx_format == 'fastq'
+    tag_bytes = tag.encode() + b':'
+    buffer_list, buffer_size = [], 65536
+    for line_id, eachline in enumerate(opened_input_fastx):
+        if (line_id % 4 == 0) if is_fastq else eachline.startswith(b'>'):
+            eachline = eachline[:1] + tag_bytes + eachline[1:]
+        buffer_list.append(eachline)
+        if len(buffer_list) >= buffer_size:
+            opened_output_fastx.writelines(buffer_list)
+            buffer_list.clear()
+    opened_output_fastx.writelines(buffer_list)
+
+
 def write_fasta(opened_fasta: TextIOWrapper,
                 seq_id: str,
                 sequence: str) -> None:
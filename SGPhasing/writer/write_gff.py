@@ -26,8 +26,9 @@ def write_partial_gff(input_gff: str,
         opened_output_gff (TextIOWrapper): opened output gff handle.
         iso_id_list (list): limited isoforms id in list.
     """
+    iso_id_set = frozenset(iso_id_list)
     with open(input_gff, 'r') as opened_input_gff:
-        for eachline in opened_input_gff:
-            iso_id = eachline.strip().split()[11][1:-2]
-            if iso_id in iso_id_list:
-                opened_output_gff.write(eachline)
+        # 12th field is the quoted transcript_id '"PB.1.1";'
+        opened_output_gff.writelines(
+            eachline for eachline in opened_input_gff
+            if eachline.split(None, 12)[11][1:-2] in iso_id_set)
@@ -21,6 +21,14 @@ import numpy as np
 
 from SGPhasing.reader.read_fastx import get_seq_dict
 
+# int for each ascii code of IUPAC bases in either case, others as 'N'
+IUPAC_BASES_STR = 'ACGTMRWSYKVHDBN'
+BASE_INT_ARRAY = np.full(256, IUPAC_BASES_STR.index('N'), dtype=np.uint8)
+BASE_INT_ARRAY[np.frombuffer(IUPAC_BASES_STR.encode(), np.uint8)] = np.arange(
+    len(IUPAC_BASES_STR))
+BASE_INT_ARRAY[np.frombuffer(IUPAC_BASES_STR.lower().encode(), np.uint8)] = (
+    np.arange(len(IUPAC_BASES_STR)))
+
 
 def write_index(output_index: str,
                 link_id_list: list,
@@ -42,8 +50,10 @@ def write_index(output_index: str,
         link_fasta_path = (
             tmp_floder_path / link_id / 'expanded_primary.reference.fasta')
         link_id_seq_dict = get_seq_dict(str(link_fasta_path))
+        # expanded reference is the only large dataset, compress it with lzf
         link_group.create_dataset(
-            'reference', data=seq_to_array(link_id_seq_dict.get(link_id, '')))
+            'reference', data=seq_to_array(link_id_seq_dict.get(link_id, '')),
+            compression='lzf')
         link_group.create_dataset(
             'positions', data=np.array(positions_list, dtype=np.uint32))
         for region_id, region_main_list in region_id_main_dict.items():
@@ -52,8 +62,8 @@ def write_index(output_index: str,
             region_group.attrs.create('chromosome', chrom)
             region_group.attrs.create('start', start)
             region_group.attrs.create('end', end)
-            region_group.create_dataset('index',
-                                        data=np.array(matrix, np.uint8))
+            region_group.create_dataset(
+                'index', data=np.asarray(matrix, dtype=np.uint8))
     opened_index.close()
 
 
@@ -66,20 +76,4 @@ def seq_to_array(sequence: str) -> np.ndarray:
     Returns:
         (ndarray): numpy array.
     """
-    BASE_INT = {
-        'A': 0, 'a': 0,
-        'C': 1, 'c': 1,
-        'G': 2, 'g': 2,
-        'T': 3, 't': 3,
-        'M': 4, 'm': 4,
-        'R': 5, 'r': 5,
-        'W': 6, 'w': 6,
-        'S': 7, 's': 7,
-        'Y': 8, 'y': 8,
-        'K': 9, 'k': 9,
-        'V': 10, 'v': 10,
-        'H': 11, 'h': 11,
-        'D': 12, 'd': 12,
-        'B': 13, 'b': 13,
-        'N': 14, 'n': 14}
-    return np.array([BASE_INT[base] for base in sequence], dtype=np.uint8)
+    return BASE_INT_ARRAY[np.frombuffer(sequence.encode(), dtype=np.uint8)]
@@ -13,24 +13,31 @@ Functions:
   - write_reads_bases_matrix
 """
 
+import numpy as np
+
+from SGPhasing.reader.read_xam import BASES_STR
+
+# base string for each base int, BLANK_INT as empty cell
+INT_BASE_ARRAY = np.array(list(BASES_STR) + [''])
+
 
 def write_reads_bases_matrix(output_file: str,
                              positions_list: list,
                              reads_id_list: list,
-                             reads_bases_matrix: list) -> None:
+                             reads_bases_matrix: np.ndarray) -> None:
     """Write read base matrix in tsv file.
 
     Args:
         output_file (str): output file path string.
-        positions_list (list): position list for each base.
+        positions_list (list): position list in matrix column order.
         reads_id_list (list): read_id list for each read.
-        reads_bases_matrix (list): bases matrix for each read.
+        reads_bases_matrix (ndarray): bases matrix for each read.
     """
-    with open(output_file, 'w') as opened_tsv:
-        HEADER = [str(pos) for pos in sorted(positions_list)]
-        HEADER.insert(0, '')
-        opened_tsv.write('\t'.join(HEADER)+'\n')
-        for read_index, read_id in enumerate(reads_id_list):
-            outline = reads_bases_matrix[read_index][::]
-            outline.insert(0, read_id)
-            opened_tsv.write('\t'.join(outline)+'\n')
+    reads_bases_str_matrix = INT_BASE_ARRAY[reads_bases_matrix].tolist()
+    with open(output_file, 'w', buffering=1 << 20) as opened_tsv:
+        opened_tsv.write('\t'.join(
+            ['', *[str(pos) for pos in positions_list]]) + '\n')
+        opened_tsv.writelines(
+            '\t'.join([read_id, *read_bases_str]) + '\n'
+            for read_id, read_bases_str in zip(
+                reads_id_list, reads_bases_str_matrix))
@@ -11,60 +11,261 @@
 
 Functions:
   - write_partial_sam
+  - view_partial_sam
+  - write_region_reads
+  - write_sharded_sam
+  - write_shard_sam
   - sam_to_bam
+  - add_read_group
+  - split_read_group
+  - write_sequence_dictionary
 """
 
+from hashlib import md5
+from multiprocessing import Pool
+from os import unlink
+from pathlib import Path
+from re import match
+from shutil import copyfileobj
+
 import pysam
 
-from SGPhasing.reader.read_bed import merge_region
+from SGPhasing.reader.read_bed import add_region, merge_region
+from SGPhasing.reader.read_xam import open_xam
+
+# samtools view -N needs pysam 0.17 (samtools 1.12) or newer
+SAMTOOLS_VERSION = tuple(
+    int(version) for version in
+    match(r'(\d+)\.(\d+)', pysam.__samtools_version__).groups())
+HAS_VIEW_READS_FILE = SAMTOOLS_VERSION >= (1, 12)
 
 
 def write_partial_sam(opened_input_xam: pysam.AlignmentFile,
                       output_sam: str,
                       limit_region_dict: dict,
-                      limit_reads_set: set) -> tuple:
+                      limit_reads_set: set,
+                      threads: int = 1) -> tuple:
     """Write sam for limit region and reads.
 
+    With limit regions and more than one thread, regions are split into
+    contiguous shards fetched in a process pool, and the shard sam bodies
+    are concatenated in region order.
+
     Args:
         opened_input_xam (AlignmentFile): input pysam opened
                                           bam/sam file handle.
         output_sam (str): output sam file path string.
         limit_region_dict (dict): chrom as key and region list as value.
         limit_reads_set (set): limited reads id set.
+        threads (int): threads using for htslib writing and region
+                       shards, default 1.
 
     Returns:
         chr_region (dict): chrom as key and region list as value.
         output_reads_set (set): output reads id set.
     """
+    region_list = [(chrom, start, end)
+                   for chrom, chrom_region_list in limit_region_dict.items()
+                   for start, end in chrom_region_list]
+    shards_num = min(threads, len(region_list))
+    if shards_num > 1:
+        return write_sharded_sam(
+            opened_input_xam, output_sam, region_list,
+            limit_reads_set, shards_num)
+    if not limit_region_dict and HAS_VIEW_READS_FILE:
+        return view_partial_sam(
+            opened_input_xam, output_sam, limit_reads_set, threads)
     opened_output_sam = pysam.AlignmentFile(
-        output_sam, 'w', template=opened_input_xam)
+        output_sam, 'w', template=opened_input_xam, threads=threads)
     chr_region, output_reads_set = {}, set()
     if limit_region_dict:
-        for chrom, region_list in limit_region_dict.items():
-            for start, end in region_list:
-                for read in opened_input_xam.fetch(chrom, start, end):
-                    if (read.query_name in limit_reads_set and
-                            not read.is_supplementary):
-                        opened_output_sam.write(read)
-                        output_reads_set.add(read.query_name)
-                        chr_region.setdefault(chrom, []).append(
-                            (read.reference_start, read.reference_end))
+        write_region_reads(opened_input_xam, opened_output_sam, region_list,
+                           limit_reads_set, chr_region, output_reads_set)
     else:
+        write_read = opened_output_sam.write
+        add_read_id = output_reads_set.add
+        # reads come sorted by chrom and start, merge them while running
+        run_tid, run_start, run_end = -1, -1, -1
         for read in opened_input_xam.fetch():
-            if (read.query_name in limit_reads_set and
-                    not read.is_supplementary):
-                opened_output_sam.write(read)
-                output_reads_set.add(read.query_name)
-                chr_region.setdefault(read.re, []).append(
-                    (read.reference_start, read.reference_end))
+            read_id = read.query_name
+            if read_id in limit_reads_set and not read.is_supplementary:
+                write_read(read)
+                add_read_id(read_id)
+                read_tid, read_start = read.reference_id, read.reference_start
+                if read_tid != run_tid or read_start > run_end:
+                    if run_tid >= 0:
+                        add_region(
+                            chr_region,
+                            opened_input_xam.get_reference_name(run_tid),
+                            run_start, run_end)
+                    run_tid, run_start, run_end = (
+                        read_tid, read_start, read.reference_end)
+                elif read.reference_end > run_end:
+                    run_end = read.reference_end
+        if run_tid >= 0:
+            add_region(chr_region, opened_input_xam.get_reference_name(
+                run_tid), run_start, run_end)
     opened_output_sam.close()
     return merge_region(chr_region), output_reads_set
 
 
+def view_partial_sam(opened_input_xam: pysam.AlignmentFile,
+                     output_sam: str,
+                     limit_reads_set: set,
+                     threads: int = 1) -> tuple:
+    """Write sam for limit reads of whole input with samtools view -N.
+
+    samtools filters every read in C, then only the kept reads are read
+    back for their regions.
+
+    Args:
+        opened_input_xam (AlignmentFile): input pysam opened
+                                          bam/sam file handle.
+        output_sam (str): output sam file path string.
+        limit_reads_set (set): limited reads id set.
+        threads (int): threads using for samtools view, default 1.
+
+    Returns:
+        chr_region (dict): chrom as key and region list as value.
+        output_reads_set (set): output reads id set.
+    """
+    reads_id_path = output_sam + '.reads_id.txt'
+    with open(reads_id_path, 'w') as opened_reads_id:
+        opened_reads_id.writelines(
+            f'{read_id}\n' for read_id in limit_reads_set)
+    try:
+        # drop unmapped and supplementary reads as the fetch loop does
+        pysam.view('-h', '--no-PG', '-F', '0x804', '-N', reads_id_path,
+                   '-@', str(threads), '-o', output_sam,
+                   opened_input_xam.filename.decode(), catch_stdout=False)
+    finally:
+        unlink(reads_id_path)
+    chr_region, output_reads_set = {}, set()
+    with pysam.AlignmentFile(output_sam, 'r') as opened_output_sam:
+        for read in opened_output_sam.fetch(until_eof=True):
+            output_reads_set.add(read.query_name)
+            add_region(chr_region, read.reference_name,
+                       read.reference_start, read.reference_end)
+    return merge_region(chr_region), output_reads_set
+
+
+def write_region_reads(opened_input_xam: pysam.AlignmentFile,
+                       opened_output_sam: pysam.AlignmentFile,
+                       region_list: list,
+                       limit_reads_set: set,
+                       chr_region: dict,
+                       output_reads_set: set) -> None:
+    """Write limit reads fetched in regions into opened sam.
+
+    Args:
+        opened_input_xam (AlignmentFile): input pysam opened
+                                          bam/sam file handle.
+        opened_output_sam (AlignmentFile): output pysam opened sam handle.
+        region_list (list): (chrom, start, end) region in list.
+        limit_reads_set (set): limited reads id set.
+        chr_region (dict): chrom as key and region list as value,
+                           updated in place.
+        output_reads_set (set): output reads id set, updated in place.
+    """
+    write_read = opened_output_sam.write
+    add_read_id = output_reads_set.add
+    for chrom, start, end in region_list:
+        # fetched reads are sorted by start, merge them while running
+        run_start, run_end = -1, -1
+        for read in opened_input_xam.fetch(chrom, start, end):
+            read_id = read.query_name
+            if read_id in limit_reads_set and not read.is_supplementary:
+                write_read(read)
+                add_read_id(read_id)
+                read_start = read.reference_start
+                if read_start > run_end:
+                    if run_end >= 0:
+                        add_region(chr_region, chrom, run_start, run_end)
+                    run_start, run_end = read_start, read.reference_end
+                elif read.reference_end > run_end:
+                    run_end = read.reference_end
+        if run_end >= 0:
+            add_region(chr_region, chrom, run_start, run_end)
+
+
+def write_sharded_sam(opened_input_xam: pysam.AlignmentFile,
+                      output_sam: str,
+                      region_list: list,
+                      limit_reads_set: set,
+                      shards_num: int) -> tuple:
+    """Write sam for limit reads with region shards in a process pool.
+
+    Args:
+        opened_input_xam (AlignmentFile): input pysam opened
+                                          bam/sam file handle.
+        output_sam (str): output sam file path string.
+        region_list (list): (chrom, start, end) region in list.
+        limit_reads_set (set): limited reads id set.
+        shards_num (int): number of region shards and processes.
+
+    Returns:
+        chr_region (dict): chrom as key and region list as value.
+        output_reads_set (set): output reads id set.
+    """
+    # cut regions in order into shards of about equal total length
+    total_length = sum(end - start for _, start, end in region_list)
+    shard_region_lists = [[] for _ in range(shards_num)]
+    accumulated_length = 0
+    for chrom, start, end in region_list:
+        shard_id = min(accumulated_length * shards_num // max(total_length, 1),
+                       shards_num - 1)
+        shard_region_lists[shard_id].append((chrom, start, end))
+        accumulated_length += end - start
+    input_xam = opened_input_xam.filename.decode()
+    shard_args = [
+        (input_xam, f'{output_sam}.shard{shard_id}', shard_region_list,
+         limit_reads_set)
+        for shard_id, shard_region_list in enumerate(shard_region_lists)
+        if shard_region_list]
+    with Pool(processes=len(shard_args)) as pool:
+        shard_returns = pool.map(write_shard_sam, shard_args)
+
+    # header from the template, then shard bodies in region order
+    pysam.AlignmentFile(output_sam, 'w', template=opened_input_xam).close()
+    chr_region, output_reads_set = {}, set()
+    with open(output_sam, 'ab') as opened_output_sam:
+        for (_, shard_sam, _, _), (shard_chr_region, shard_reads_set) in zip(
+                shard_args, shard_returns):
+            with open(shard_sam, 'rb') as opened_shard_sam:
+                copyfileobj(opened_shard_sam, opened_output_sam, 1 << 20)
+            unlink(shard_sam)
+            for chrom, chrom_region_list in shard_chr_region.items():
+                chr_region.setdefault(chrom, []).extend(chrom_region_list)
+            output_reads_set.update(shard_reads_set)
+    return merge_region(chr_region), output_reads_set
+
+
+def write_shard_sam(shard_args: tuple) -> tuple:
+    """Write headless sam for limit reads in one shard of regions.
+
+    Args:
+        shard_args (tuple): (input_xam, shard_sam, region_list,
+                            limit_reads_set) tuple.
+
+    Returns:
+        chr_region (dict): chrom as key and region list as value.
+        output_reads_set (set): output reads id set.
+    """
+    input_xam, shard_sam, region_list, limit_reads_set = shard_args
+    chr_region, output_reads_set = {}, set()
+    with open_xam(input_xam) as opened_input_xam, pysam.AlignmentFile(
+            shard_sam, 'w', template=opened_input_xam,
+            add_sam_header=False) as opened_shard_sam:
+        write_region_reads(opened_input_xam, opened_shard_sam, region_list,
+                           limit_reads_set, chr_region, output_reads_set)
+    return chr_region, output_reads_set
+
+
 def sam_to_bam(input_sam: str,
                reference: str,
                output_bam: str,
-               threads: int = 1) -> None:
+               threads: int = 1,
+               compress_level: int = 1) -> None:
     """Sort sam and save to bam.
 
     Args:
@@ -72,6 +273,95 @@ def sam_to_bam(input_sam: str,
         reference (str): reference fasta file path string.
         output_bam (str): output bam file path string.
         threads (int): threads using for pysam.sort, default 1.
+        compress_level (int): bgzf compression level of output bam,
+                              default 1 for intermediate files.
     """
     pysam.sort('-o', output_bam, '--output-fmt', 'BAM',
-               '--reference', reference, '--threads', str(threads), input_sam)
+               '-l', str(compress_level), '--reference', reference,
+               '--threads', str(threads), input_sam)
+
+
+def add_read_group(input_bam: str,
+                   output_bam: str,
+                   rglb: str,
+                   rgpl: str,
+                   rgpu: str,
+                   rgsm: str,
+                   threads: int = 1) -> None:
+    """Replace read groups of all reads with a single new one.
+
+    Args:
+        input_bam (str): input bam file path string.
+        output_bam (str): output bam file path string.
+        rglb (str): read-group library.
+        rgpl (str): read-group platform (e.g. ILLUMINA, SOLID).
+        rgpu (str): read-group platform unit (eg. run barcode).
+        rgsm (str): read-group sample name.
+        threads (int): threads using for htslib, default 1.
+    """
+    with pysam.AlignmentFile(input_bam, 'rb', threads=threads) as opened_input:
+        header_dict = opened_input.header.to_dict()
+        header_dict['RG'] = [
+            {'ID': '1', 'LB': rglb, 'PL': rgpl, 'PU': rgpu, 'SM': rgsm}]
+        with pysam.AlignmentFile(output_bam, 'wb', header=header_dict,
+                                 threads=threads) as opened_output:
+            for read in opened_input.fetch(until_eof=True):
+                read.set_tag('RG', '1', 'Z')
+                opened_output.write(read)
+
+
+def split_read_group(input_bam: str,
+                     output_bam_dict: dict,
+                     rgpl: str,
+                     rgpu: str,
+                     rgsm: str,
+                     threads: int = 1) -> None:
+    """Split reads tagged as 'tag:read_id' into bams of their read group.
+
+    The tag is stripped from read names and used as read-group library,
+    and the input order is kept, so sorted input gives sorted outputs.
+
+    Args:
+        input_bam (str): input bam file path string.
+        output_bam_dict (dict): tag as key and output bam path as value.
+        rgpl (str): read-group platform (e.g. ILLUMINA, SOLID).
+        rgpu (str): read-group platform unit (eg. run barcode).
+        rgsm (str): read-group sample name.
+        threads (int): threads using for htslib, default 1.
+    """
+    with pysam.AlignmentFile(input_bam, 'rb', threads=threads) as opened_input:
+        header_dict = opened_input.header.to_dict()
+        opened_output_dict = {}
+        for tag, output_bam in output_bam_dict.items():
+            header_dict['RG'] = [
+                {'ID': '1', 'LB': tag, 'PL': rgpl, 'PU': rgpu, 'SM': rgsm}]
+            opened_output_dict[tag] = pysam.AlignmentFile(
+                output_bam, 'wb', header=header_dict, threads=threads)
+        try:
+            for read in opened_input.fetch(until_eof=True):
+                tag, read.query_name = read.query_name.split(':', 1)
+                read.set_tag('RG', '1', 'Z')
+                opened_output_dict[tag].write(read)
+        finally:
+            for opened_output in opened_output_dict.values():
+                opened_output.close()
+
+
+def write_sequence_dictionary(reference: str, output_dict: str) -> None:
+    """Write sequence dictionary for an indexed reference fasta.
+
+    Args:
+        reference (str): reference fasta file path string.
+        output_dict (str): output dict file path string.
+    """
+    reference_uri = Path(reference).resolve().as_uri()
+    dict_lines = ['@HD\tVN:1.6\n']
+    with pysam.FastaFile(reference) as opened_reference:
+        for seq_name, seq_len in zip(opened_reference.references,
+                                     opened_reference.lengths):
+            seq_md5 = md5(
+                opened_reference.fetch(seq_name).upper().encode()).hexdigest()
+            dict_lines.append(f'@SQ\tSN:{seq_name}\tLN:{seq_len}\t'
+                              f'M5:{seq_md5}\tUR:{reference_uri}\n')
+    with open(output_dict, 'w') as opened_dict:
+        opened_dict.writelines(dict_lines)
@@ -35,10 +35,26 @@ import ctypes
 from locale import getpreferredencoding
 import os
 import platform
-from re import sub
+from re import match
+from shutil import which
 from subprocess import CalledProcessError, PIPE, Popen, run
 import sys
 
+try:
+    from functools import cached_property
+except ImportError:
+    # python 3.7 has no functools.cached_property
+    from functools import lru_cache
+
+    def cached_property(func):
+        """Property computed once for each instance."""
+        return property(lru_cache(maxsize=None)(func))
+
+try:
+    from packaging.requirements import Requirement
+except ImportError:
+    Requirement = None
+
 from SGPhasing.sys_output import Output
 
 
@@ -81,7 +97,7 @@ class Environment(object):
         self.get_required_packages()
         super().__init__()
 
-    @property
+    @cached_property
     def is_admin(self) -> bool:
         """Check whether user is admin.
 
@@ -94,26 +110,27 @@ class Environment(object):
             retval = ctypes.windll.shell32.IsUserAnAdmin() != 0
         return retval
 
-    @property
+    @cached_property
     def os_version(self) -> tuple:
         """Get OS Version."""
         return platform.system(), platform.release()
 
-    @property
+    @cached_property
     def py_version(self) -> tuple:
         """Get Python Version."""
         return platform.python_version(), platform.architecture()[0]
 
-    @property
+    @cached_property
     def is_conda(self) -> bool:
         """Check whether using Conda.
 
         Returns:
             (bool)
         """
-        return 'conda' in sys.version.lower()
+        return (os.path.isdir(os.path.join(sys.prefix, 'conda-meta')) or
+                'conda' in sys.version.lower())
 
-    @property
+    @cached_property
     def is_virtualenv(self) -> bool:
         """Check whether this is a virtual environment.
 
@@ -129,7 +146,7 @@ class Environment(object):
             retval = os.path.basename(prefix) == 'envs'
         return retval
 
-    @property
+    @cached_property
     def encoding(self):
         """Get system encoding."""
         return getpreferredencoding()
@@ -201,28 +218,34 @@ class Environment(object):
 
     def get_installed_packages(self) -> None:
         """Get currently installed packages."""
-        self.installed_packages = {}
-        chk = Popen(f'"{sys.executable}" -m pip freeze',
-                    shell=True, stdout=PIPE)
-        installed = chk.communicate()[0].decode(self.encoding).splitlines()
-
-        for pkg in installed:
-            if '==' not in pkg:
-                continue
-            item = pkg.split('==')
-            self.installed_packages.update({item[0]: item[1]})
+        try:
+            from importlib.metadata import distributions
+        except ImportError:
+            # python 3.7 has no importlib.metadata, ask pip freeze
+            chk = Popen([sys.executable, '-m', 'pip', 'freeze'], stdout=PIPE)
+            installed = chk.communicate()[0].decode(
+                self.encoding).splitlines()
+            self.installed_packages = {
+                name: version for name, sep, version in (
+                    pkg.partition('==') for pkg in installed) if sep}
+            return
+        # read .dist-info metadata directly instead of running pip,
+        # skip broken distributions whose metadata has no name
+        self.installed_packages = {
+            dist.metadata['Name']: dist.version for dist in distributions()
+            if dist.metadata['Name']}
 
     def get_installed_conda_packages(self) -> None:
         """Get currently installed conda packages."""
         if not self.is_conda:
             return
+        # conda-meta holds a name-version-build.json file for each package
         self.installed_conda_packages = {}
-        chk = os.popen('conda list').read()
-        installed = [sub(' +', ' ', line.strip())
-                     for line in chk.splitlines() if not line.startswith('#')]
-        for pkg in installed:
-            item = pkg.split(' ')
-            self.installed_conda_packages.update({item[0]: item[1]})
+        with os.scandir(os.path.join(sys.prefix, 'conda-meta')) as entries:
+            for entry in entries:
+                if entry.name.endswith('.json'):
+                    name, version, _ = entry.name[:-5].rsplit('-', 2)
+                    self.installed_conda_packages[name] = version
 
     def get_required_packages(self) -> None:
         """Load requirements list."""
@@ -272,33 +295,39 @@ class Install(object):
 
     def check_missing_dep(self) -> None:
         """Check for missing dependencies."""
+        # package names are case insensitive and treat '_' as '-'
+        installed_packages = {
+            name.lower().replace('_', '-'): version
+            for name, version in self.env.installed_packages.items()}
         for pkg in self.env.required_packages:
-            pkgs = pkg.split('==')
-            key = pkgs[0]
-            if key not in self.env.installed_packages:
-                self.env.missing_packages.append(pkg)
-                continue
+            if Requirement is None:
+                # only exact '==' pins can be checked without packaging
+                name = match(r'[A-Za-z0-9._-]+', pkg).group()
+                specifier = pkg[len(name):].strip()
+                version = installed_packages.get(
+                    name.lower().replace('_', '-'))
+                is_missing = version is None or (
+                    specifier.startswith('==') and
+                    specifier[2:].strip() != version)
             else:
-                if len(pkgs) > 1:
-                    if pkgs[1] != self.env.installed_packages.get(key):
-                        self.env.missing_packages.append(pkg)
-                        continue
+                requirement = Requirement(pkg)
+                version = installed_packages.get(
+                    requirement.name.lower().replace('_', '-'))
+                is_missing = version is None or (
+                    not requirement.specifier.contains(
+                        version, prereleases=True))
+            if is_missing:
+                self.env.missing_packages.append(pkg)
 
     def check_conda_missing_dep(self) -> None:
         """Check for conda missing dependencies."""
         if not self.env.is_conda:
             return
+        # conda required packages are (name,) or (name, channel) tuples
+        installed_conda_packages = self.env.installed_conda_packages
         for pkg in self.env.conda_required_packages:
-            pkgs = pkg.split('==')
-            key = pkgs[0]
-            if key not in self.env.installed_packages:
+            if pkg[0] not in installed_conda_packages:
                 self.env.conda_missing_packages.append(pkg)
-                continue
-            else:
-                if len(pkgs) > 1:
-                    if pkgs[1] != self.env.installed_conda_packages.get(key):
-                        self.env.conda_missing_packages.append(pkg)
-                        continue
 
     def install_missing_dep(self) -> None:
         """Install missing dependencies."""
@@ -314,19 +343,23 @@ class Install(object):
         """Install required conda packages."""
         self.output.info(
             'Installing Required Conda Packages. This may take some time...')
+        # one conda run per channel, so the solver runs once for each
+        channel_packages_dict = {}
         for pkg in self.env.conda_missing_packages:
             channel = '' if len(pkg) != 2 else pkg[1]
-            self.conda_installer(pkg[0], channel=channel, conda_only=True)
+            channel_packages_dict.setdefault(channel, []).append(pkg[0])
+        for channel, packages in channel_packages_dict.items():
+            self.conda_installer(packages, channel=channel, conda_only=True)
 
     def conda_installer(self,
-                        package: str,
+                        packages: list,
                         channel: str = '',
                         verbose: bool = False,
                         conda_only: bool = False) -> bool:
-        """Install a conda package.
+        """Install conda packages in one conda run.
 
         Args:
-            package (str): package name string.
+            packages (list): package name strings.
             channel (str): channel name string, default ''.
             verbose (bool): verbose, default False.
             conda_only (bool): if conda only, default False.
@@ -335,12 +368,14 @@ class Install(object):
             success (bool): if success.
         """
         success = True
-        condaexe = ['conda', 'install', '-y']
+        # mamba solves the same install with libsolv, much faster
+        condaexe = [which('mamba') or 'conda', 'install', '-y']
         if not verbose:
             condaexe.append('-q')
         if channel:
             condaexe.extend(['-c', channel])
-        condaexe.append(package)
+        condaexe.extend(packages)
+        package = ' '.join(packages)
         self.output.info(f'Installing {package}')
         try:
             if verbose:
@@ -366,14 +401,21 @@ class Install(object):
         """
         self.output.info(
             'Installing Required Python Packages. This may take some time...')
-        for pkg in self.env.missing_packages:
-            self.pip_installer(pkg)
+        # one pip run resolves and downloads all packages together
+        if not self.pip_installer(self.env.missing_packages, quiet=True):
+            # find out which packages failed one by one
+            for pkg in self.env.missing_packages:
+                self.pip_installer([pkg])
 
-    def pip_installer(self, package: str) -> None:
-        """Install a pip package.
+    def pip_installer(self, packages: list, quiet: bool = False) -> bool:
+        """Install pip packages in one pip run.
 
         Args:
-            package (str): package name string.
+            packages (list): package name strings.
+            quiet (bool): if not warn on failure, default False.
+
+        Returns:
+            success (bool): if success.
         """
         pipexe = [sys.executable, '-m', 'pip']
         # hide info/warning and fix cache hang
@@ -381,14 +423,18 @@ class Install(object):
         # install as user to solve perm restriction
         if not self.env.is_admin and not self.env.is_virtualenv:
             pipexe.append('--user')
+        package = ' '.join(packages)
         msg = f'Installing {package}'
         self.output.info(msg)
-        pipexe.append(package)
+        pipexe.extend(packages)
         try:
             run(pipexe, check=True)
         except CalledProcessError:
-            self.output.warning(f'Couldn\'t install {package} with pip. '
-                                'Please install this package manually')
+            if not quiet:
+                self.output.warning(f'Couldn\'t install {package} with pip. '
+                                    'Please install this package manually')
+            return False
+        return True
 
 
 def main() -> None:
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Shang Xie.
+# All rights reserved.
+#
+# This file is part of the SGPhasing distribution and
+# governed by your choice of the "SGPhasing License Agreement"
+# or the "GNU General Public License v3.0".
+# Please see the LICENSE file that should
+# have been included as part of this package.
+"""Test SGPhasing.processor.collapse."""
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+
+from SGPhasing.processor.collapse import check_fastx_ids_unique
+
+
+class TestCheckFastxIdsUnique(unittest.TestCase):
+    """Test check_fastx_ids_unique."""
+
+    def setUp(self) -> None:
+        """Create a temporary folder."""
+        self.tmp_dir = TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        """Remove the temporary folder."""
+        self.tmp_dir.cleanup()
+
+    def write_fastx(self, fastx_bytes: bytes, suffix: str) -> str:
+        """Write fasta/q bytes into the temporary folder.
+
+        Args:
+            fastx_bytes (bytes): fasta/q file content.
+            suffix (str): file suffix.
+
+        Returns:
+            input_fastx (str): written fasta/q file path string.
+        """
+        input_fastx = Path(self.tmp_dir.name) / f'input.{suffix}'
+        input_fastx.write_bytes(fastx_bytes)
+        return str(input_fastx)
+
+    def test_fastq_with_trailing_blank_line(self) -> None:
+        """A blank line after the last record is accepted."""
+        check_fastx_ids_unique(
+            self.write_fastx(b'@a\nACGT\n+\nIIII\n\n', 'fq'), True)
+
+    def test_fasta_with_blank_lines(self) -> None:
+        """Blank lines before and after the records are accepted."""
+        check_fastx_ids_unique(
+            self.write_fastx(b'\n>a\nACGT\n>b desc\nACGT\n\n', 'fa'), False)
+
+    def test_duplicate_id(self) -> None:
+        """A duplicate id is reported and exits."""
+        with self.assertRaises(SystemExit):
+            check_fastx_ids_unique(self.write_fastx(
+                b'@a\nACGT\n+\nIIII\n@a\nACGT\n+\nIIII\n', 'fq'), True)
+
+    def test_empty_header(self) -> None:
+        """An empty header is reported and exits instead of raising."""
+        with self.assertRaises(SystemExit):
+            check_fastx_ids_unique(
+                self.write_fastx(b'@\nACGT\n+\nIIII\n', 'fq'), True)
+        with self.assertRaises(SystemExit):
+            check_fastx_ids_unique(
+                self.write_fastx(b'@a\nACGT\n+\nIIII\n@ \nAC\n+\nII\n',
+                                 'fq'), True)
+
+
+if __name__ == '__main__':
+    unittest.main()
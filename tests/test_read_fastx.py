@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Shang Xie.
+# All rights reserved.
+#
+# This file is part of the SGPhasing distribution and
+# governed by your choice of the "SGPhasing License Agreement"
+# or the "GNU General Public License v3.0".
+# Please see the LICENSE file that should
+# have been included as part of this package.
+"""Test SGPhasing.reader.read_fastx."""
+
+import gzip
+from pathlib import Path
+from shutil import which
+from subprocess import CalledProcessError
+from tempfile import TemporaryDirectory
+import unittest
+
+from SGPhasing.reader.read_fastx import open_gzip, Process_Reader
+
+FASTQ_BYTES = b''.join(
+    b'@read%d\nACGTACGTAC\n+\nIIIIIIIIII\n' % read_id
+    for read_id in range(1000))
+
+
+class TestOpenGzip(unittest.TestCase):
+    """Test open_gzip and Process_Reader."""
+
+    def setUp(self) -> None:
+        """Write an intact and a truncated gzipped fastq."""
+        self.tmp_dir = TemporaryDirectory()
+        gzip_bytes = gzip.compress(FASTQ_BYTES)
+        self.intact_gzip = str(Path(self.tmp_dir.name) / 'intact.fq.gz')
+        Path(self.intact_gzip).write_bytes(gzip_bytes)
+        self.truncated_gzip = str(Path(self.tmp_dir.name) / 'truncated.fq.gz')
+        Path(self.truncated_gzip).write_bytes(
+            gzip_bytes[:len(gzip_bytes) // 2])
+
+    def tearDown(self) -> None:
+        """Remove the gzipped fastq."""
+        self.tmp_dir.cleanup()
+
+    def test_open_gzip_reads_intact_input(self) -> None:
+        """Every line of intact input is read."""
+        with open_gzip(self.intact_gzip) as opened_gzip:
+            self.assertEqual(b''.join(opened_gzip), FASTQ_BYTES)
+
+    def test_open_gzip_raises_on_truncated_input(self) -> None:
+        """Truncated input raises instead of yielding partial reads."""
+        with self.assertRaises((CalledProcessError, EOFError)):
+            with open_gzip(self.truncated_gzip) as opened_gzip:
+                for _ in opened_gzip:
+                    pass
+
+    @unittest.skipUnless(which('gzip'), 'gzip not found')
+    def test_process_reader_raises_on_truncated_input(self) -> None:
+        """A nonzero exit of the process raises at EOF."""
+        opened_gzip = Process_Reader(['gzip', '-cd', self.truncated_gzip])
+        with self.assertRaises(CalledProcessError):
+            for _ in opened_gzip:
+                pass
+        self.assertIsNotNone(opened_gzip.proc.returncode)
+
+    @unittest.skipUnless(which('gzip'), 'gzip not found')
+    def test_process_reader_early_close(self) -> None:
+        """Closing before EOF stops the process without raising."""
+        opened_gzip = Process_Reader(['gzip', '-cd', self.intact_gzip])
+        opened_gzip.readline()
+        opened_gzip.close()
+        self.assertTrue(opened_gzip.closed)
+        self.assertIsNotNone(opened_gzip.proc.returncode)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Shang Xie.
+# All rights reserved.
+#
+# This file is part of the SGPhasing distribution and
+# governed by your choice of the "SGPhasing License Agreement"
+# or the "GNU General Public License v3.0".
+# Please see the LICENSE file that should
+# have been included as part of this package.
+"""Test SGPhasing.reader.read_xam."""
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+
+import pysam
+
+from SGPhasing.reader.read_xam import (BASES_STR, BLANK_INT,
+                                       extract_read_matrix, GAP_INT)
+
+
+class TestExtractReadMatrix(unittest.TestCase):
+    """Test extract_read_matrix."""
+
+    def setUp(self) -> None:
+        """Write a sorted and indexed bam of a spliced and a deleted read."""
+        self.tmp_dir = TemporaryDirectory()
+        self.input_bam = str(Path(self.tmp_dir.name) / 'input.bam')
+        header = {'HD': {'VN': '1.6', 'SO': 'coordinate'},
+                  'SQ': [{'SN': 'chr1', 'LN': 100}]}
+        with pysam.AlignmentFile(self.input_bam, 'wb',
+                                 header=header) as opened_bam:
+            # 0-based positions: 10-13 match, 14-23 skip, 24-27 match
+            # and 12-15 match, 16-17 deletion, 18-21 match
+            for read_id, start, cigar in (('spliced', 10, '4M10N4M'),
+                                          ('deleted', 12, '4M2D4M')):
+                read = pysam.AlignedSegment(opened_bam.header)
+                read.query_name = read_id
+                read.reference_id = 0
+                read.reference_start = start
+                read.cigarstring = cigar
+                read.query_sequence = 'ACGTACGT'
+                read.query_qualities = pysam.qualitystring_to_array(
+                    'IIIIIIII')
+                read.mapping_quality = 60
+                opened_bam.write(read)
+        pysam.index(self.input_bam)
+
+    def tearDown(self) -> None:
+        """Remove the bam."""
+        self.tmp_dir.cleanup()
+
+    def test_reference_skip_and_deletion_are_gaps(self) -> None:
+        """Reference skips are gaps like deletions, uncovered is blank."""
+        positions_list = [10, 16, 20, 26, 40]
+        reads_id_list, reads_bases_matrix = extract_read_matrix(
+            self.input_bam, positions_list)
+        reads_bases_dict = dict(zip(reads_id_list, reads_bases_matrix))
+        self.assertEqual(reads_bases_dict['spliced'].tolist(), [
+            BASES_STR.index('A'), GAP_INT, GAP_INT,
+            BASES_STR.index('G'), BLANK_INT])
+        self.assertEqual(reads_bases_dict['deleted'].tolist(), [
+            BLANK_INT, GAP_INT, BASES_STR.index('G'),
+            BLANK_INT, BLANK_INT])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Shang Xie.
+# All rights reserved.
+#
+# This file is part of the SGPhasing distribution and
+# governed by your choice of the "SGPhasing License Agreement"
+# or the "GNU General Public License v3.0".
+# Please see the LICENSE file that should
+# have been included as part of this package.
+"""Test SGPhasing.Regions."""
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+
+from SGPhasing.Regions import get_info_value, Linked_Region, Region
+
+
+def build_region(transcript_id: str, start: int, end: int,
+                 exons_list: list) -> Region:
+    """Build a transcript region with its exons.
+
+    Args:
+        transcript_id (str): transcript id string.
+        start (int): transcript start position.
+        end (int): transcript end position.
+        exons_list (list): (start, end) exon in list.
+
+    Returns:
+        region (Region): transcript region with exon children.
+    """
+    gene_id = transcript_id.rsplit('.', 1)[0]
+    region = Region('chr1', start, end, '+',
+                    f'ID={transcript_id};Parent={gene_id}')
+    region.update_child_list([
+        Region('chr1', exon_start, exon_end, '+',
+               f'ID={transcript_id}.exon{exon_id};Parent={transcript_id}')
+        for exon_id, (exon_start, exon_end) in enumerate(exons_list)])
+    return region
+
+
+def read_parent_exons(input_gff: str) -> dict:
+    """Read exons of each parent from gff3 file.
+
+    Args:
+        input_gff (str): input gff3 file path string.
+
+    Returns:
+        parent_exons_dict (dict): parent id as key and exon (start, end)
+                                  set as value.
+    """
+    parent_exons_dict = {}
+    with open(input_gff) as opened_gff:
+        for eachline in opened_gff:
+            sp = eachline.rstrip('\n').split('\t')
+            if sp[2] == 'exon':
+                parent_exons_dict.setdefault(
+                    get_info_value(sp[8], 'Parent'), set()).add(
+                        (int(sp[3]), int(sp[4])))
+    return parent_exons_dict
+
+
+class TestLinkedRegion(unittest.TestCase):
+    """Test Linked_Region."""
+
+    def setUp(self) -> None:
+        """Build a linked region of two transcripts."""
+        self.primary_exons_list = [(100, 200), (400, 500), (700, 800)]
+        self.secondary_exons_list = [(5100, 5200), (5700, 5800)]
+        self.linked_region = Linked_Region(
+            build_region('PB.1.1', 100, 800, self.primary_exons_list))
+        self.linked_region.append_secondary(
+            build_region('PB.2.1', 5100, 5800, self.secondary_exons_list))
+
+    def test_write_combined_gff_keeps_exons_of_each_transcript(self) -> None:
+        """Renaming the extended primary must not move primary exons."""
+        with TemporaryDirectory() as tmp_dir:
+            combined_gff = str(Path(tmp_dir) / 'combined.gff3')
+            self.linked_region.write_combined_gff(combined_gff, 'link1', 50)
+            parent_exons_dict = read_parent_exons(combined_gff)
+        self.assertEqual(parent_exons_dict, {
+            'PB.1.1': set(self.primary_exons_list),
+            'PB.2.1': set(self.secondary_exons_list),
+            'link1': {(50, 200), (400, 500), (700, 850)}})
+
+    def test_extend_primary_leaves_primary_untouched(self) -> None:
+        """The extended region shares no child with the primary region."""
+        expanded_primary_region = self.linked_region.extend_primary(50)
+        expanded_primary_region.update_info_id('link1')
+        primary_region = self.linked_region.Primary_Region
+        self.assertEqual(
+            [(each_child.start, each_child.end)
+             for each_child in primary_region.child_list],
+            self.primary_exons_list)
+        self.assertEqual(
+            {each_child.get_info_id()
+             for each_child in primary_region.child_list}, {'PB.1.1'})
+
+
+if __name__ == '__main__':
+    unittest.main()
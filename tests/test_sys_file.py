@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Shang Xie.
+# All rights reserved.
+#
+# This file is part of the SGPhasing distribution and
+# governed by your choice of the "SGPhasing License Agreement"
+# or the "GNU General Public License v3.0".
+# Please see the LICENSE file that should
+# have been included as part of this package.
+"""Test SGPhasing.sys_file."""
+
+from os import utime
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+
+from SGPhasing.sys_file import atomic_output, is_up_to_date
+
+
+class TestAtomicOutput(unittest.TestCase):
+    """Test atomic_output and is_up_to_date."""
+
+    def setUp(self) -> None:
+        """Write an input file older than any output."""
+        self.tmp_dir = TemporaryDirectory()
+        self.input_path = str(Path(self.tmp_dir.name) / 'input.txt')
+        Path(self.input_path).write_text('input\n')
+        utime(self.input_path, (0, 0))
+        self.output_path = str(Path(self.tmp_dir.name) / 'output.vcf')
+
+    def tearDown(self) -> None:
+        """Remove the files."""
+        self.tmp_dir.cleanup()
+
+    def test_failed_run_leaves_no_output(self) -> None:
+        """A partial output is dropped when the run raises."""
+        with self.assertRaises(RuntimeError):
+            with atomic_output(self.output_path, ['-x', '1']) as tmp_path:
+                Path(tmp_path).write_text('partial\n')
+                raise RuntimeError
+        self.assertEqual(
+            [each_path.name
+             for each_path in Path(self.tmp_dir.name).iterdir()],
+            ['input.txt'])
+        self.assertFalse(is_up_to_date(
+            self.output_path, self.input_path, args=['-x', '1']))
+
+    def test_output_and_index_moved_into_place(self) -> None:
+        """Output and its index are moved beside the output path."""
+        with atomic_output(self.output_path, ['-x', '1']) as tmp_path:
+            Path(tmp_path).write_text('output\n')
+            Path(tmp_path + '.idx').write_text('index\n')
+        self.assertEqual(Path(self.output_path).read_text(), 'output\n')
+        self.assertTrue(Path(self.output_path + '.idx').is_file())
+        self.assertTrue(is_up_to_date(
+            self.output_path, self.input_path, args=['-x', '1']))
+
+    def test_changed_args_are_not_up_to_date(self) -> None:
+        """Output built with other arguments is not reused."""
+        with atomic_output(self.output_path, ['-x', '1']) as tmp_path:
+            Path(tmp_path).write_text('output\n')
+        self.assertFalse(is_up_to_date(
+            self.output_path, self.input_path, args=['-x', '2']))
+        self.assertTrue(is_up_to_date(self.output_path, self.input_path))
+
+
+if __name__ == '__main__':
+    unittest.main()